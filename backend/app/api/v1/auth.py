@@ -7,14 +7,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 import exceptions
 from dao import user as dao
+from dao.base import UniqueViolationError
 from dependencies.database import get_db
 from helpers.security import (
-    hash_pwd,
+    pwd_hasher,
     create_user_tokens,
     get_user_token,
     authenticate_user,
     oauth2_scheme,
+    token_cache,
 )
+from models.user import User
 from schemas import user as schemas
 
 router = APIRouter(tags=["Auth"], prefix="/auth")
@@ -29,28 +32,19 @@ router = APIRouter(tags=["Auth"], prefix="/auth")
 async def _create_one(
     info_form: Annotated[schemas.UserRequest, Depends()],
     pwd_form: Annotated[schemas.UserPasswords, Depends()],
-    session: Annotated[AsyncSession, Depends(get_db)],
+    session: Annotated[AsyncSession, Depends(get_db, scope="function")],
 ) -> schemas.UserResponse:
     data = info_form.model_dump()
+    if pwd_form.password != pwd_form.confirmation_password:
+        raise exceptions.AUTH_EXCEPTION_CREATE_USER
+    data["hashed_password"] = await pwd_hasher.hash(pwd_form.password)
+    # the unique constraints are the existence check, no SELECT race window
     try:
-        exist_username = await dao.UserDAO(session).find_one_or_none(
-            username=info_form.username
-        )
-
-        if exist_username:
-            raise exceptions.AUTH_EXCEPTION_CONFLICT_USERNAME
-
-        if info_form.email:
-            exist_email = await dao.UserDAO(session).find_one_or_none(
-                email=info_form.email
-            )
-            if exist_email:
-                raise exceptions.AUTH_EXCEPTION_CONFLICT_EMAIL
-
-        if pwd_form.password == pwd_form.confirmation_password:
-            data["hashed_password"] = hash_pwd(pwd_form.password)
-
         return await dao.UserDAO(session).add_one_and_return(**data)
+    except UniqueViolationError as e:
+        if e.column == "email":
+            raise exceptions.AUTH_EXCEPTION_CONFLICT_EMAIL
+        raise exceptions.AUTH_EXCEPTION_CONFLICT_USERNAME
     except Exception:
         raise exceptions.AUTH_EXCEPTION_CREATE_USER
 
@@ -62,7 +56,7 @@ async def _create_one(
 )
 async def _login_pwd(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    session: Annotated[AsyncSession, Depends(get_db)],
+    session: Annotated[AsyncSession, Depends(get_db, scope="function")],
 ):
     user: schemas.TokenData = await authenticate_user(
         session, form_data.username, form_data.password
@@ -84,7 +78,7 @@ async def _login_pwd(
 )
 async def refresh_access_token(
     token: Annotated[str, Depends(oauth2_scheme)],
-    session: Annotated[AsyncSession, Depends(get_db)],
+    session: Annotated[AsyncSession, Depends(get_db, scope="function")],
 ):
     user = get_user_token(token)
 
@@ -92,22 +86,22 @@ async def refresh_access_token(
     if not user_db:
         raise exceptions.CREDENTIALS_EXCEPTION_USER_DB
     user_db = schemas.TokenData(**user_db.__dict__)
-    return create_user_tokens(user_db)
+    tokens = create_user_tokens(user_db)
+    token_cache.revoke(token)
+    return tokens
 
 
 @router.post("/logout")
 async def logout(
     token: Annotated[str, Depends(oauth2_scheme)],
-    session: Annotated[AsyncSession, Depends(get_db)],
+    session: Annotated[AsyncSession, Depends(get_db, scope="function")],
 ):
     user = get_user_token(token)
 
-    user_db = await dao.UserDAO(session).find_one_or_none(username=user.username)
-    if not user_db or not user_db.refresh_token:
-        raise exceptions.CREDENTIALS_EXCEPTION_USER_DB
-    success = await dao.UserDAO(session).update_one_by_id(
-        _id=user_db.id, refresh_token=None
+    logged_out = await dao.UserDAO(session).update_one_by_name(
+        user.username, User.refresh_token.is_not(None), refresh_token=None
     )
-    if not success:
-        raise exceptions.CREDENTIALS_EXCEPTION_LOGOUT
+    if not logged_out:
+        raise exceptions.CREDENTIALS_EXCEPTION_USER_DB
+    token_cache.revoke(token)
     return "Logout successful"
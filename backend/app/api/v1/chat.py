@@ -1,15 +1,33 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Request, WebSocket, Depends, WebSocketDisconnect
+from fastapi import (
+    APIRouter,
+    Request,
+    WebSocket,
+    Depends,
+    WebSocketDisconnect,
+    Query,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import exceptions
 from core.conf import templates, logger
+from core.database import async_db_session
 from dao import chat as dao
 from dao import user as u_dao
 from dependencies.chat import get_chat_user_by_token
 from dependencies.database import get_db
+from helpers.conditional import (
+    body_etag,
+    is_not_modified,
+    not_modified_response,
+    validators,
+)
+from helpers.message_writer import message_writer
+from helpers.paginator import decode_cursor
 from helpers.socket_manager import manager
 from schemas import chat as schemas
+from schemas.base import JSONResponse
 from schemas import user as u_schemas
 
 router = APIRouter(prefix="/chat", tags=["Websocket"])
@@ -17,31 +35,65 @@ router = APIRouter(prefix="/chat", tags=["Websocket"])
 
 @router.get("/")
 async def get_chat_page(request: Request):
-    return templates.TemplateResponse("chat.html", {"request": request})
+    response = templates.TemplateResponse(request, "chat.html")
+    # a stable ETag lets the compressed page be cached and revalidated
+    headers = validators(body_etag(response.body))
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
+    response.headers.update(headers)
+    return response
 
 
 @router.get("/all_users")
 async def get_all_chat_users():
-    users_list = [*manager.active_connections.keys()]
+    users_list = manager.online_users()
     return {"users_list": users_list}
 
 
-@router.get("/messages")
+@router.get(
+    "/messages",
+    response_model=schemas.MessageHistoryResponse,
+    summary="Chat history, newest messages first",
+)
 async def get_all_chat_messages(
-    session: Annotated[AsyncSession, Depends(get_db)],
+    session: Annotated[AsyncSession, Depends(get_db, scope="function")],
     current_user: Annotated[u_schemas.TokenData, Depends(get_chat_user_by_token)],
+    size: Annotated[int, Query(ge=1, le=100)] = 20,
+    before: Annotated[
+        str | None, Query(description="Cursor, returns older messages")
+    ] = None,
+    after: Annotated[
+        str | None, Query(description="Cursor, returns newer messages")
+    ] = None,
 ):
-    messages = await dao.MessageDAO(session).get_chat(current_user.id)
-    return {"messages_list": messages}
+    if before is not None and after is not None:
+        raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR
+    try:
+        messages, older, newer = await dao.MessageDAO(session).get_chat(
+            current_user.id,
+            limit=size,
+            before=decode_cursor(before) if before is not None else None,
+            after=decode_cursor(after) if after is not None else None,
+        )
+    except ValueError:
+        raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR
+    # rows already have the MessageResponse shape, skip pydantic and dump with orjson
+    return JSONResponse(
+        {
+            "version": schemas.MESSAGE_HISTORY_VERSION,
+            "messages_list": messages,
+            "before": older,
+            "after": newer,
+        }
+    )
 
 
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
-    session: Annotated[AsyncSession, Depends(get_db)],
     current_user: Annotated[u_schemas.TokenData, Depends(get_chat_user_by_token)],
 ):
-    await manager.connect(websocket, current_user.username)
+    await manager.connect(websocket, current_user.username, current_user.id)
     try:
         while True:
             message = schemas.ReceiveMessage.parse_obj(await websocket.receive_json())
@@ -53,26 +105,26 @@ async def websocket_endpoint(
                 await manager.broadcast(message_obj)
                 await manager.send_personal_message(message_obj)
             else:
-                user: u_schemas.UserResponse = await u_dao.UserDAO(
-                    session
-                ).find_one_or_none(username=message.receiver)
+                # a short session, so an open socket does not hold a pooled connection
+                async with async_db_session() as session:
+                    receiver = await u_dao.UserDAO(session).get_id_by_username(
+                        message.receiver
+                    )
                 message_obj = schemas.SendMessage(
                     receiver=message.receiver,
                     text=message.text,
                     sender=current_user.username,
                 )
                 await manager.send_personal_message(message_obj)
-                if not user:
+                if receiver is None:
                     logger.error(f"{message.receiver} not found")
-                else:
-                    receiver = user.id
 
-            await dao.MessageDAO(session).add_one_and_return(
+            await message_writer.add(
                 receiver_id=receiver, text=message.text, sender_id=current_user.id
             )
 
     except WebSocketDisconnect:
-        manager.disconnect(current_user.username)
+        await manager.disconnect(current_user.username, websocket)
         message_dict = schemas.SendMessage(
             receiver="all", text="left the chat", sender=current_user.username
         )
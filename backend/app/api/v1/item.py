@@ -1,28 +1,196 @@
-from fastapi import APIRouter, status, UploadFile, File, Form
+from fastapi import APIRouter, status, UploadFile, File, Form, Query, Request, Response
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import exceptions
 from dao import item as dao
+from models.item import Item
 from dependencies.database import get_db
 from dependencies.user import check_admin_role
-from helpers.paginator import pagination
-from helpers.upload import handle_file_upload
+from helpers.bulk import bulk_rows, validate_rows
+from helpers.conditional import (
+    conditional_json,
+    entity_etag,
+    is_not_modified,
+    not_modified_response,
+    validators,
+)
+from helpers.export import ExportFormat, export_response
+from helpers.paginator import create_pagination_info, pagination
+from helpers.upload import handle_image_upload
 from schemas import item as schemas
-from schemas.base import PageInfo, Page
+from schemas.base import PageInfo, Page, BulkResponse, IdResponse
 
 router = APIRouter(prefix="/items", tags=["items"])
 
 
+# search, bulk and export routes go before /{item_id}, which would otherwise match them
+@router.get("/search", response_model=Page, summary="Full-text search of items")
+async def _search(
+    q: str | None = Query(
+        None, max_length=200, description="Words to find in the name or description"
+    ),
+    prefix: bool = Query(
+        False, description="Match the last word as a prefix, for autocomplete"
+    ),
+    price_min: float | None = None,
+    price_max: float | None = None,
+    sort: schemas.ItemSearchSort = "rank",
+    page_params: dict = Depends(pagination),
+    session: AsyncSession = Depends(get_db, scope="function"),
+):
+    """
+    Searches items by words of their name or description.
+
+    All words must match. "rank" sorts by relevance, except for prefix
+    searches, which list the newest matches first. Pages are numbered and the
+    total is not counted.
+    """
+    if page_params["after"] is not None or page_params["before"] is not None:
+        raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR
+    limit, offset = page_params["limit"], page_params["offset"]
+    entities, has_next = await dao.ItemsDAO(session).search(
+        q,
+        limit,
+        offset,
+        prefix=prefix,
+        price_min=price_min,
+        price_max=price_max,
+        sort=sort,
+    )
+    return Page(
+        page_info=PageInfo(
+            **create_pagination_info(
+                limit, offset, count=None, approximate=True, has_next=has_next
+            )
+        ),
+        page_data=entities,
+    )
+
+
+@router.get("/export", summary="Stream all items as NDJSON or CSV")
+async def _export(
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    name: str | None = Query(None, description="Substring of the item name"),
+    price_min: float | None = None,
+    price_max: float | None = None,
+    # request scope keeps the session open while the response streams
+    session: AsyncSession = Depends(get_db),
+):
+    where = []
+    if name is not None:
+        where.append(Item.name.contains(name, autoescape=True))
+    if price_min is not None:
+        where.append(Item.price >= price_min)
+    if price_max is not None:
+        where.append(Item.price <= price_max)
+    columns = list(schemas.ItemResponse.model_fields)
+    return export_response(
+        dao.ItemsDAO(session).stream(columns, *where),
+        columns,
+        export_format,
+        filename="items",
+    )
+
+
+@router.post(
+    "/bulk",
+    response_model=BulkResponse,
+    dependencies=[Depends(check_admin_role)],
+)
+async def _create_many(
+    upsert: bool = False,
+    rows: list = Depends(bulk_rows),
+    session: AsyncSession = Depends(get_db, scope="function"),
+):
+    """
+    Creates items from a JSON array or NDJSON body.
+
+    With `upsert`, rows carrying an existing id update that item instead.
+    Invalid rows are reported by their index and do not stop the others.
+    """
+    valid, errors = validate_rows(rows, schemas.ItemBulkCreateRequest)
+    if upsert:
+        values = [
+            item.model_dump(exclude={"id"} if item.id is None else None)
+            for _, item in valid
+        ]
+        ids = await dao.ItemsDAO(session).upsert_many(values)
+    else:
+        values = [item.model_dump(exclude={"id"}) for _, item in valid]
+        ids = await dao.ItemsDAO(session).add_many(values)
+    return BulkResponse(ids=ids, errors=errors)
+
+
+@router.patch(
+    "/bulk",
+    response_model=BulkResponse,
+    dependencies=[Depends(check_admin_role)],
+)
+async def _update_many(
+    rows: list = Depends(bulk_rows),
+    session: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Updates the fields present in each row of the item with the row's id."""
+    valid, errors = validate_rows(rows, schemas.ItemBulkUpdateRequest)
+    values = []
+    for index, item in valid:
+        row = item.model_dump(exclude_unset=True)
+        if len(row) == 1:
+            errors.append({"index": index, "detail": "Nothing to update"})
+        else:
+            values.append((index, row))
+    ids = await dao.ItemsDAO(session).update_many_by_id([row for _, row in values])
+    updated = set(ids)
+    for index, row in values:
+        if row["id"] not in updated:
+            errors.append({"index": index, "detail": "Item not found"})
+    errors.sort(key=lambda error: error["index"])
+    return BulkResponse(ids=ids, errors=errors)
+
+
+@router.delete(
+    "/bulk",
+    response_model=BulkResponse,
+    dependencies=[Depends(check_admin_role)],
+)
+async def _delete_many(
+    rows: list = Depends(bulk_rows),
+    session: AsyncSession = Depends(get_db, scope="function"),
+):
+    """Deletes items by id, rows are ids or {"id": ...} objects."""
+    rows = [(index, {"id": v} if isinstance(v, int) else v) for index, v in rows]
+    valid, errors = validate_rows(rows, IdResponse)
+    ids = await dao.ItemsDAO(session).delete_many_by_id([row.id for _, row in valid])
+    deleted = set(ids)
+    for index, row in valid:
+        if row.id not in deleted:
+            errors.append({"index": index, "detail": "Item not found"})
+    errors.sort(key=lambda error: error["index"])
+    return BulkResponse(ids=ids, errors=errors)
+
+
 @router.get(
     "/{item_id}",
     response_model=schemas.ItemResponse,
 )
-async def _get_one_by_id(item_id: int, session: AsyncSession = Depends(get_db)):
-    entity = await dao.ItemsDAO(session).find_one_or_none(id=item_id)
-    if entity:
-        return entity
-    raise exceptions.ITEM_EXCEPTION_NOT_FOUND_ITEM
+async def _get_one_by_id(
+    item_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_db, scope="function"),
+):
+    items = dao.ItemsDAO(session)
+    # the validators come from the same cached or primary row as the body
+    found = await items.find_one_versioned(item_id)
+    if found is None:
+        raise exceptions.ITEM_EXCEPTION_NOT_FOUND_ITEM
+    entity, updated = found
+    headers = validators(entity_etag(item_id, updated), updated)
+    if is_not_modified(request, headers["ETag"], updated):
+        return not_modified_response(headers)
+    response.headers.update(headers)
+    return entity
 
 
 @router.get(
@@ -30,18 +198,25 @@ async def _get_one_by_id(item_id: int, session: AsyncSession = Depends(get_db)):
     response_model=Page,
 )
 async def _get_many(
+    request: Request,
     page_params: dict = Depends(pagination),
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_db, scope="function"),
 ):
-    pagination_info, page_entities = await dao.ItemsDAO(session).find_all_by_page(
-        **page_params
-    )
+    try:
+        pagination_info, page_entities = await dao.ItemsDAO(session).find_all_by_page(
+            **page_params, schema=schemas.ItemResponse
+        )
+    except ValueError:
+        raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR
     if not page_entities:
         raise exceptions.ITEM_EXCEPTION_NOT_FOUND_PAGE
 
-    return Page(
-        page_info=PageInfo(**pagination_info),
-        page_data=[schemas.ItemResponse(**entity.__dict__) for entity in page_entities],
+    return conditional_json(
+        request,
+        Page(
+            page_info=PageInfo(**pagination_info),
+            page_data=page_entities,
+        ),
     )
 
 
@@ -54,13 +229,12 @@ async def _get_many(
 async def _create_one(
     item: schemas.ItemRequest = Depends(),
     image_file: UploadFile | str | None = File(None, media_type="image/*"),
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_db, scope="function"),
 ):
     data = item.model_dump()
     if image_file:
         try:
-            file_name = await handle_file_upload(image_file)
-            data["image"] = file_name
+            data.update(await handle_image_upload(image_file))
         except ValueError:
             raise exceptions.ITEM_EXCEPTION_IMAGE
     return await dao.ItemsDAO(session).add_one_and_return(**data)
@@ -77,7 +251,7 @@ async def _update_one_by_id(
     description: str | None = Form(None),
     price: float = Form(0),
     image_file: UploadFile | str | None = File(None, media_type="image/*"),
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_db, scope="function"),
 ):
     data = dict(
         name=name,
@@ -87,14 +261,13 @@ async def _update_one_by_id(
 
     if image_file:
         try:
-            file_name = await handle_file_upload(image_file)
-            data["image"] = file_name
-
+            data.update(await handle_image_upload(image_file))
         except ValueError:
             raise exceptions.ITEM_EXCEPTION_IMAGE
 
-    if await dao.ItemsDAO(session).find_one_or_none(id=item_id):
-        return await dao.ItemsDAO(session).update_one_by_id(item_id, **data)
+    entity = await dao.ItemsDAO(session).update_one_by_id(item_id, **data)
+    if entity:
+        return entity
     raise exceptions.ITEM_EXCEPTION_NOT_FOUND_ITEM
 
 
@@ -102,8 +275,9 @@ async def _update_one_by_id(
     "/{item_id}",
     dependencies=[Depends(check_admin_role)],
 )
-async def _delete_by_id(item_id: int, session: AsyncSession = Depends(get_db)):
-    if await dao.ItemsDAO(session).find_one_or_none(id=item_id):
-        if await dao.ItemsDAO(session).delete(id=item_id):
-            return {"detail": f"Deleted id={item_id}"}
+async def _delete_by_id(
+    item_id: int, session: AsyncSession = Depends(get_db, scope="function")
+):
+    if await dao.ItemsDAO(session).delete(id=item_id):
+        return {"detail": f"Deleted id={item_id}"}
     raise exceptions.ITEM_EXCEPTION_NOT_FOUND_ITEM
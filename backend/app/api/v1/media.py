@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Request
+
+import exceptions
+from core.conf import settings
+from helpers.conditional import is_not_modified, not_modified_response
+from helpers.media import CachedFileResponse, media_files
+from helpers.storage import KEY_RE, media_storage
+
+router = APIRouter(prefix=settings.media_url, tags=["media"])
+
+
+@router.api_route(
+    "/{key:path}", methods=["GET", "HEAD"], summary="Uploaded image or thumbnail"
+)
+async def _get_media(key: str, request: Request):
+    """
+    Serves a stored image, with Range requests.
+
+    Content-addressed keys never change, they are cached as immutable and
+    their ETag is the key itself, so a revalidation is answered without
+    touching the file.
+    """
+    try:
+        path = media_storage.path(key)
+    except ValueError:
+        raise exceptions.MEDIA_EXCEPTION_NOT_FOUND
+    match = KEY_RE.match(key)
+    if match is not None:
+        etag = f'"{match.group(1)}{match.group(2) or ""}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={settings.media_max_age}, immutable",
+        }
+        if is_not_modified(request, etag):
+            return not_modified_response(headers)
+    try:
+        opened = await media_files.acquire(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise exceptions.MEDIA_EXCEPTION_NOT_FOUND
+    if match is None:
+        stat_result = opened.stat_result
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        headers = {"ETag": etag, "Cache-Control": "public, no-cache"}
+        if is_not_modified(request, etag):
+            media_files.release(opened)
+            return not_modified_response(headers)
+    return CachedFileResponse(opened, path, headers=headers)
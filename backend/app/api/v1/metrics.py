@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends
+
+from core.database import pool_stats
+from dependencies.user import check_admin_role
+from helpers.compression import response_compressor
+from helpers.images import image_processor
+from helpers.media import media_files
+from helpers.message_writer import message_writer
+from helpers.security import pwd_hasher
+from helpers.socket_manager import manager
+from helpers.storage import media_collector, media_storage
+
+router = APIRouter(
+    prefix="/metrics", tags=["Metrics"], dependencies=[Depends(check_admin_role)]
+)
+
+
+@router.get("/", summary="Runtime metrics of worker pools, queues and db pools")
+async def get_metrics():
+    return {
+        "password_hasher": pwd_hasher.stats(),
+        "image_processor": image_processor.stats(),
+        "media": {
+            **media_storage.stats(),
+            "gc": media_collector.stats(),
+            "files": media_files.stats(),
+        },
+        "websockets": manager.stats(),
+        "chat_writer": message_writer.stats(),
+        "database": pool_stats(),
+        "compression": response_compressor.stats(),
+    }
@@ -1,14 +1,24 @@
 from typing import Annotated
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request, Response
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import exceptions
 from dao import user as dao
+from dao.base import UniqueViolationError
 from dependencies.database import get_db
 from dependencies.user import get_current_active_user, check_admin_role
+from helpers.conditional import (
+    conditional_json,
+    entity_etag,
+    is_not_modified,
+    not_modified_response,
+    validators,
+)
+from helpers.export import ExportFormat, export_response
 from helpers.paginator import pagination
+from models.user import User
 from schemas import user as schemas
 from schemas.base import PageInfo, Page
 
@@ -32,21 +42,59 @@ def read_user_me(
 async def _update_one_by_id(
     user: Annotated[schemas.UserResponse, Depends(get_current_active_user)],
     data: schemas.UserUpdate = Depends(),
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_db, scope="function"),
 ):
     data = data.model_dump()
-    return await dao.UserDAO(session).update_one_by_id(user.id, **data)
+    try:
+        return await dao.UserDAO(session).update_one_by_id(user.id, **data)
+    except UniqueViolationError:
+        raise exceptions.AUTH_EXCEPTION_CONFLICT_EMAIL
+
+
+@router.get(
+    "/export",
+    summary="Stream all active users as NDJSON or CSV",
+    dependencies=[Depends(check_admin_role)],
+)
+async def _export(
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    role: str | None = None,
+    # request scope keeps the session open while the response streams
+    session: AsyncSession = Depends(get_db),
+):
+    filters = {"is_active": 1}
+    if role is not None:
+        filters["role"] = role
+    columns = list(schemas.UserResponse.model_fields)
+    return export_response(
+        dao.UserDAO(session).stream(columns, **filters),
+        columns,
+        export_format,
+        filename="users",
+    )
 
 
 @router.get(
     "/{user_id}",
     response_model=schemas.UserResponse,
 )
-async def _get_one_by_id(user_id: int, session: AsyncSession = Depends(get_db)):
-    entity = await dao.UserDAO(session).find_one_or_none(id=user_id, is_active=1)
-    if entity:
-        return entity
-    raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
+async def _get_one_by_id(
+    user_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_db, scope="function"),
+):
+    users = dao.UserDAO(session)
+    # the validators come from the same cached or primary row as the body
+    found = await users.find_one_versioned(user_id, is_active=1)
+    if found is None:
+        raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
+    entity, updated = found
+    headers = validators(entity_etag(user_id, updated), updated)
+    if is_not_modified(request, headers["ETag"], updated):
+        return not_modified_response(headers)
+    response.headers.update(headers)
+    return entity
 
 
 @router.get(
@@ -54,18 +102,25 @@ async def _get_one_by_id(user_id: int, session: AsyncSession = Depends(get_db)):
     response_model=Page,
 )
 async def _get_many(
+    request: Request,
     page_params: dict = Depends(pagination),
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_db, scope="function"),
 ):
-    pagination_info, page_entities = await dao.UserDAO(session).find_all_by_page(
-        **page_params, is_active=1
-    )
+    try:
+        pagination_info, page_entities = await dao.UserDAO(session).find_all_by_page(
+            **page_params, schema=schemas.UserResponse, is_active=1
+        )
+    except ValueError:
+        raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR
     if not page_entities:
         raise exceptions.USER_EXCEPTION_NOT_FOUND_PAGE
 
-    return Page(
-        page_info=PageInfo(**pagination_info),
-        page_data=[schemas.UserResponse(**entity.__dict__) for entity in page_entities],
+    return conditional_json(
+        request,
+        Page(
+            page_info=PageInfo(**pagination_info),
+            page_data=page_entities,
+        ),
     )
 
 
@@ -77,17 +132,26 @@ async def _get_many(
 async def _update_one_by_id(
     user_id: int,
     user: schemas.UserUpdate = Depends(),
-    session: AsyncSession = Depends(get_db),
+    session: AsyncSession = Depends(get_db, scope="function"),
 ):
     data = user.model_dump()
-    if await dao.UserDAO(session).find_one_or_none(id=user_id, is_active=1):
-        return await dao.UserDAO(session).update_one_by_id(user_id, **data)
+    try:
+        entity = await dao.UserDAO(session).update_one_by_id(
+            user_id, User.is_active == 1, **data
+        )
+    except UniqueViolationError:
+        raise exceptions.AUTH_EXCEPTION_CONFLICT_EMAIL
+    if entity:
+        return entity
     raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
 
 
 @router.delete("/{user_id}", dependencies=[Depends(check_admin_role)])
-async def _delete_by_id(user_id: int, session: AsyncSession = Depends(get_db)):
-    if await dao.UserDAO(session).find_one_or_none(id=user_id, is_active=1):
-        if await dao.UserDAO(session).update_one_by_id(_id=user_id, is_active=None):
-            return {"detail": f"Deleted id={user_id}"}
+async def _delete_by_id(
+    user_id: int, session: AsyncSession = Depends(get_db, scope="function")
+):
+    if await dao.UserDAO(session).update_one_by_id(
+        user_id, User.is_active == 1, is_active=None
+    ):
+        return {"detail": f"Deleted id={user_id}"}
     raise exceptions.USER_EXCEPTION_NOT_FOUND_USER
@@ -1,7 +1,10 @@
 import logging
+import os
+import tempfile
 from functools import lru_cache
 from logging import config as logging_config
 from pathlib import Path
+from typing import Literal
 
 from pydantic_settings import SettingsConfigDict, BaseSettings
 from starlette.templating import Jinja2Templates
@@ -35,15 +38,103 @@ class Settings(BaseSettings):
     reload: bool = False
 
     # db
-    db_echo: bool = True
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # seconds before a pooled connection is replaced, -1 keeps them forever
+    db_pool_recycle: int = 3600
+    db_pool_timeout: float = 30.0
+    # ping connections on every checkout, costs a round trip per checkout
+    db_pool_pre_ping: bool = False
+    # applied to every new SQLite connection
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 2**20
+    sqlite_busy_timeout: int = 5000
     sqlite_filename: str = "db_project"
     sqlite_database_uri: str = f"sqlite+aiosqlite:///./{sqlite_filename}.db"
     sqlalchemy_database_uri: str = sqlite_database_uri
+    # read replicas, a session reads from one of them until it writes
+    sqlalchemy_replica_uris: list[str] = []
+
+    # bulk endpoints: max rows per request, ids per IN (...) list
+    bulk_max_rows: int = 50000
+    bulk_chunk_size: int = 5000
+    # rows fetched per round trip by the streaming exports
+    export_batch_size: int = 1000
+
+    # uploads are stored under BASE_DIR/upload_dir and served at media_url,
+    # "object" uses a local stand-in for an object store instead of plain files
+    media_storage: Literal["local", "object"] = "local"
+    upload_dir: str = "uploads"
+    upload_max_size: int = 10 * 2**20
+    upload_chunk_size: int = 2**20
+    media_url: str = "/media"
+    # Cache-Control max-age of content-addressed media, open files kept for serving
+    media_max_age: int = 365 * 24 * 3600
+    media_fd_cache_size: int = 256
+    # image thumbnails, rendered in a process pool when Pillow is installed
+    thumbnail_widths: list[int] = [160, 480]
+    thumbnail_format: Literal["webp", "jpeg"] = "webp"
+    thumbnail_quality: int = 80
+    image_workers: int = os.cpu_count() or 1
+    image_concurrency: int = os.cpu_count() or 1
+    # unreferenced media is deleted every media_gc_interval seconds (0 disables)
+    # once it is older than media_gc_grace seconds
+    media_gc_interval: float = 3600.0
+    media_gc_grace: float = 3600.0
+
+    # response compression, encodings in order of preference,
+    # "br" and "zstd" are used when brotli / zstandard are installed
+    compression_encodings: list[str] = ["zstd", "br", "gzip"]
+    compression_minimum_size: int = 1024
+    compression_content_types: list[str] = [
+        "application/json",
+        "application/x-ndjson",
+        "text/csv",
+        "text/html",
+        "text/plain",
+    ]
+    # bodies from this size up are compressed in a worker thread
+    compression_offload_size: int = 256 * 1024
+    # bytes of compressed bodies of responses with an ETag kept for repeat hits
+    compression_cache_size: int = 32 * 2**20
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+    # websocket permessage-deflate, negotiated by uvicorn
+    ws_per_message_deflate: bool = True
+
+    # cache
+    count_cache_ttl: float = 30.0
+    count_cache_size: int = 1024
+    entity_cache_size: int = 10000
+    entity_cache_ttl: float = 300.0
+    user_directory_size: int = 100000
+
+    # chat, "memory" for a single worker, "unix" to share between local workers
+    chat_backplane: Literal["memory", "unix"] = "memory"
+    chat_backplane_path: str = os.path.join(tempfile.gettempdir(), "store-chat.sock")
+    chat_send_queue_size: int = 256
+    # what to do when a client's send queue is full: "drop_oldest" or "disconnect"
+    chat_slow_consumer_policy: Literal["drop_oldest", "disconnect"] = "drop_oldest"
+    # chat messages are written to the db in batches, flushed by size or time
+    chat_write_batch_size: int = 500
+    chat_write_flush_interval: float = 0.2
+    chat_write_buffer_size: int = 10000
+    # a failed batch is retried with doubling delays, then its rows are dropped
+    chat_write_retries: int = 5
+    chat_write_retry_delay: float = 0.1
 
     # auth
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24
+    token_cache_size: int = 10000
+    # password hashing runs in a "thread" or "process" pool, "inline" blocks the loop
+    pwd_hash_executor: Literal["thread", "process", "inline"] = "thread"
+    pwd_hash_workers: int = os.cpu_count() or 1
+    pwd_hash_concurrency: int = os.cpu_count() or 1
 
 
 @lru_cache
@@ -1,29 +1,135 @@
+import random
 import sys
+import time
+from collections import deque
+from typing import Awaitable, Callable
 
+from sqlalchemy import event, exc, Delete, Insert, Update
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     async_sessionmaker,
     AsyncSession,
     AsyncEngine,
 )
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from core.conf import settings, logger
 from models.base import MappedBase
 
 
+class PoolMetrics:
+    """Checkout counters and wait times of one connection pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.max_checked_out = 0
+        self.wait_times: deque[float] = deque(maxlen=1024)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        self.metrics.wait_times.append(time.perf_counter() - start)
+        self.metrics.checkouts += 1
+        self.metrics.max_checked_out = max(
+            self.metrics.max_checked_out, self.checkedout()
+        )
+        return connection
+
+    def stats(self) -> dict[str, int | float]:
+        waits = sorted(self.metrics.wait_times)
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "max_checked_out": self.metrics.max_checked_out,
+            "checkouts": self.metrics.checkouts,
+            "timeouts": self.metrics.timeouts,
+            "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 3) if waits else 0.0,
+            "wait_max_ms": round(waits[-1] * 1000, 3) if waits else 0.0,
+        }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+    cursor.close()
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from a replica and writes to the primary.
+
+    Flushes and INSERT/UPDATE/DELETE statements go to the primary engine, and
+    from then on the whole session stays there, so a request reads its own
+    writes. Other statements go to one replica picked per session. Setting
+    `session.info["primary"] = True` pins the session to the primary, an
+    explicit bind in bind_arguments pins a single statement.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["primary"] = True
+        if self.info.get("primary") or not replica_engines:
+            return self.bind
+        if "replica" not in self.info:
+            self.info["replica"] = random.choice(replica_engines).sync_engine
+        return self.info["replica"]
+
+
 def create_engine_and_session(
     url: str,
 ) -> tuple[AsyncEngine, async_sessionmaker[AsyncSession]]:
+    url_obj = make_url(url)
+    is_sqlite = url_obj.get_backend_name() == "sqlite"
+    options = {}
+    # in-memory SQLite lives in a single connection, keep SQLAlchemy's StaticPool
+    if not (is_sqlite and url_obj.database in (None, "", ":memory:")):
+        options = dict(
+            poolclass=MeteredQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_recycle=settings.db_pool_recycle,
+            pool_timeout=settings.db_pool_timeout,
+        )
     try:
         engine = create_async_engine(
-            url, echo=settings.db_echo, future=True, pool_pre_ping=True
+            url,
+            echo=settings.db_echo,
+            future=True,
+            pool_pre_ping=settings.db_pool_pre_ping,
+            **options,
         )
     except Exception as e:
         logger.error("Database connection failed {}", e)
         sys.exit()
     else:
+        if is_sqlite:
+            event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
         db_session = async_sessionmaker(
-            bind=engine, autoflush=False, expire_on_commit=False
+            bind=engine,
+            sync_session_class=RoutingSession,
+            autoflush=False,
+            expire_on_commit=False,
         )
         return engine, db_session
 
@@ -31,6 +137,37 @@ def create_engine_and_session(
 async_engine, async_db_session = create_engine_and_session(
     settings.sqlalchemy_database_uri
 )
+replica_engines = [
+    create_engine_and_session(url)[0] for url in settings.sqlalchemy_replica_uris
+]
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]):
+    """Registers a callback to run once the session's transaction is committed."""
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+async def commit(session: AsyncSession):
+    """Commits the session, then runs its after_commit callbacks."""
+    await session.commit()
+    for callback in session.info.pop("after_commit", []):
+        await callback()
+
+
+async def rollback(session: AsyncSession):
+    """Rolls the session back and drops its after_commit callbacks."""
+    session.info.pop("after_commit", None)
+    await session.rollback()
+
+
+def pool_stats() -> dict[str, dict[str, int | float]]:
+    engines = {"primary": async_engine}
+    for index, engine in enumerate(replica_engines):
+        engines[f"replica_{index}"] = engine
+    return {
+        name: engine.pool.stats() if isinstance(engine.pool, MeteredQueuePool) else {}
+        for name, engine in engines.items()
+    }
 
 
 async def create_tables():
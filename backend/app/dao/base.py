@@ -1,10 +1,51 @@
-from typing import Sequence, Type
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from typing import Any, AsyncIterator, Sequence, Type
 
-from sqlalchemy import insert, select, update, delete, func
-from sqlalchemy.engine import Result
+from pydantic import BaseModel
+from sqlalchemy import insert, select, update, delete, func, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Result, Row
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from helpers.paginator import create_pagination_info
+from core.conf import settings
+from core.database import after_commit
+from helpers.cache import count_cache, entity_cache
+from helpers.paginator import create_pagination_info, encode_cursor
+from models.base import utc_now
+
+# "UNIQUE constraint failed: user.email" (SQLite), "Key (email)=(...)" (PostgreSQL)
+UNIQUE_COLUMN_RE = re.compile(r"UNIQUE constraint failed: \w+\.(\w+)|Key \((\w+)\)=")
+
+
+class UniqueViolationError(Exception):
+    """
+    A write hit a unique constraint.
+
+    params:
+        - column: the column that already holds the value, None if unknown
+    """
+
+    def __init__(self, column: str | None):
+        super().__init__(f"Unique constraint violated on {column}")
+        self.column = column
+
+
+@contextmanager
+def unique_violation():
+    """Turns unique constraint IntegrityErrors into UniqueViolationError."""
+    try:
+        yield
+    except IntegrityError as e:
+        message = str(e.orig)
+        if "UNIQUE" not in message.upper() and "duplicate key" not in message:
+            raise
+        match = UNIQUE_COLUMN_RE.search(message)
+        column = (match.group(1) or match.group(2)) if match else None
+        raise UniqueViolationError(column) from e
 
 
 class BaseDAO:
@@ -13,9 +54,13 @@ class BaseDAO:
 
     params:
         - model: SQLAlchemy DeclarativeBase child class
+        - cursor_columns: indexed, unique together columns used for keyset pagination
+        - response_schema: pydantic schema cached by find_one_response
     """
 
     model = None
+    response_schema = None
+    cursor_columns: tuple[str, ...] = ("id",)
 
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -35,33 +80,309 @@ class BaseDAO:
         result = await self.session.execute(query)
         return result.scalar_one_or_none()
 
+    async def find_one_response(self, _id: int, **kwargs):
+        """
+        Асинхронно находит экземпляр модели по идентификатору и возвращает его
+        в виде response_schema, используя entity_cache.
+
+        Аргументы:
+            _id: Идентификатор записи,
+            **kwargs: Дополнительные критерии фильтрации.
+
+        Возвращает:
+            Экземпляр response_schema или None, если ничего не найдено.
+        """
+        found = await self.find_one_versioned(_id, **kwargs)
+        return found[0] if found is not None else None
+
+    async def find_one_versioned(
+        self, _id: int, **kwargs
+    ) -> tuple[BaseModel, datetime] | None:
+        """
+        Асинхронно находит экземпляр модели по идентификатору и возвращает его
+        в виде response_schema вместе со значением updated, используя entity_cache.
+
+        Из таблицы читаются только колонки response_schema и updated.
+        Сериализованная схема кешируется вместе с updated по первичному ключу и
+        критериям фильтрации на entity_cache_ttl секунд и удаляется из кеша при
+        любой записи этого экземпляра через DAO. Кеш и его сброс действуют в
+        пределах процесса. Тело и updated всегда относятся к одной строке,
+        поэтому по ним можно строить ETag и Last-Modified ответа.
+
+        Аргументы:
+            _id: Идентификатор записи,
+            **kwargs: Дополнительные критерии фильтрации.
+
+        Возвращает:
+            Пару из экземпляра response_schema и updated или None, если ничего
+            не найдено.
+        """
+        if self.session.info.get("after_commit"):
+            # the session has uncommitted writes, the cache does not reflect them
+            return await self._find_one_projected(_id, **kwargs)
+
+        table = self.model.__tablename__
+        payload = await entity_cache.get(table, _id, kwargs)
+        if payload is not None:
+            # "<updated isoformat> <response json>"
+            updated, body = payload.split(b" ", 1)
+            return (
+                self.response_schema.model_validate_json(body),
+                datetime.fromisoformat(updated.decode("ascii")),
+            )
+
+        generation = entity_cache.generation(table, _id)
+        found = await self._find_one_projected(_id, **kwargs)
+        if found is None:
+            return None
+        response, updated = found
+        await entity_cache.set(
+            table,
+            _id,
+            kwargs,
+            b" ".join(
+                (
+                    updated.isoformat().encode("ascii"),
+                    response.model_dump_json().encode("utf-8"),
+                )
+            ),
+            generation=generation,
+        )
+        return found
+
+    async def _find_one_projected(self, _id: int, **kwargs):
+        query = select(*self._projection(self.response_schema, "updated")).filter_by(
+            id=_id, **kwargs
+        )
+        # read the primary, replica lag must not end up in the cache
+        primary = self.session.sync_session.bind
+        result = await self.session.execute(query, bind_arguments={"bind": primary})
+        row = result.first()
+        if row is None:
+            return None
+        return self.response_schema.model_validate(row._mapping), row.updated
+
     async def find_all_by_page(
-        self, limit: int, offset: int = 0, **kwargs
-    ) -> tuple[dict, Sequence[Type[model]]]:
+        self,
+        limit: int,
+        offset: int = 1,
+        after: list | None = None,
+        before: list | None = None,
+        estimate: bool = False,
+        schema: type[BaseModel] | Sequence[str] | None = None,
+        **kwargs,
+    ) -> tuple[dict, Sequence[Any]]:
         """
         Асинхронно находит и возвращает все экземпляры модели, удовлетворяющие указанным критериям.
 
+        Страница выбирается либо по номеру (LIMIT/OFFSET), либо по курсору (keyset):
+        строки упорядочены по cursor_columns, и курсор after/before задает значения
+        этих колонок, от которых начинается выборка, поэтому время ответа не зависит
+        от глубины страницы.
+
+        С schema выбираются только нужные колонки, без ORM объектов и identity map:
+        для pydantic схемы возвращаются ее экземпляры, для списка колонок - строки
+        (Row) с доступом к значениям по имени.
+
         Аргументы:
-            page_number: Критерии номера страницы,
-            page_size: Критерии количества объектов на странице.
+            limit: Критерии количества объектов на странице,
+            offset: Критерии номера страницы,
+            after: Значения cursor_columns, после которых выбираются строки,
+            before: Значения cursor_columns, до которых выбираются строки,
+            estimate: Если True, допускается приблизительное общее количество,
+            schema: Pydantic схема ответа или список имен колонок,
+            **kwargs: Критерии фильтрации в виде именованных параметров.
 
         Возвращает:
-            Словарь с информацией о странице и список экземпляров модели.
+            Словарь с информацией о странице и список экземпляров модели,
+            схемы или строк.
         """
 
-        query = select(self.model).filter_by(**kwargs)
-        query_count = select(func.count(self.model.id)).filter_by(**kwargs)
+        columns = [getattr(self.model, name) for name in self.cursor_columns]
+        if schema is None:
+            query = select(self.model)
+        else:
+            query = select(*self._projection(schema, *self.cursor_columns))
+        query = query.filter_by(**kwargs)
+
+        cursor = after if after is not None else before
+        if cursor is None:
+            query = query.order_by(*columns).offset((offset - 1) * limit)
+        else:
+            key, values = tuple_(*columns), tuple_(*self._cursor_values(cursor))
+            if after is not None:
+                query = query.where(key > values).order_by(*columns)
+            else:
+                query = query.where(key < values).order_by(*(c.desc() for c in columns))
+        # one extra row tells whether a next page exists without relying on the count
+        query = query.limit(limit + 1)
 
-        query = query.limit(limit).offset(offset - 1)
         res: Result = await self.session.execute(query)
-        res_count: Result = await self.session.execute(query_count)
-        page_entities = res.unique().scalars().all()
-        all_entities_count = res_count.unique().scalars().first()
+        if schema is None:
+            page_entities = list(res.unique().scalars().all())
+        else:
+            page_entities = list(res.all())
+        all_entities_count, approximate = await self.count(estimate=estimate, **kwargs)
+
+        has_more = len(page_entities) > limit
+        page_entities = page_entities[:limit]
+        if cursor is None:
+            has_next = has_more
+            has_prev = offset > 1
+        else:
+            if before is not None:
+                page_entities.reverse()
+            has_next = has_more if after is not None else True
+            has_prev = has_more if before is not None else True
+
         pagination_info = create_pagination_info(
-            page_size=limit, page_number=offset, count=all_entities_count
+            page_size=limit,
+            page_number=offset if cursor is None else None,
+            count=all_entities_count,
+            approximate=approximate,
+            has_next=has_next,
+            next_cursor=self._cursor(page_entities[-1])
+            if page_entities and has_next
+            else None,
+            previous_cursor=self._cursor(page_entities[0])
+            if page_entities and has_prev
+            else None,
         )
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            page_entities = [
+                schema.model_validate(row._mapping) for row in page_entities
+            ]
         return pagination_info, page_entities
 
+    def _projection(self, schema: type[BaseModel] | Sequence[str], *extra: str):
+        """
+        Возвращает колонки модели для полей схемы (или имен колонок) и extra.
+
+        Поля схемы, которым не соответствует колонка модели, пропускаются.
+        """
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            names = list(schema.model_fields)
+        else:
+            names = list(schema)
+        names += [name for name in extra if name not in names]
+        table_columns = self.model.__table__.c
+        return [getattr(self.model, name) for name in names if name in table_columns]
+
+    async def stream(
+        self,
+        columns: Sequence[str],
+        *where,
+        batch_size: int | None = None,
+        **kwargs,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Асинхронно читает выбранные колонки всех подходящих строк пачками по id.
+
+        Использует серверный курсор (AsyncSession.stream с yield_per), поэтому
+        в памяти одновременно находится не больше batch_size строк, сколько бы
+        их ни было в таблице.
+
+        Аргументы:
+            columns: Имена колонок модели.
+            *where: Дополнительные условия фильтрации.
+            batch_size: Размер пачки, по умолчанию settings.export_batch_size.
+            **kwargs: Критерии фильтрации в виде именованных параметров.
+
+        Возвращает:
+            Асинхронный итератор пачек строк.
+        """
+        query = (
+            select(*(getattr(self.model, name) for name in columns))
+            .filter_by(**kwargs)
+            .where(*where)
+            .order_by(self.model.id)
+            .execution_options(yield_per=batch_size or settings.export_batch_size)
+        )
+        result = await self.session.stream(query)
+        async for partition in result.partitions():
+            yield partition
+
+    async def count(self, estimate: bool = False, **kwargs) -> tuple[int, bool]:
+        """
+        Асинхронно возвращает количество экземпляров модели, удовлетворяющих критериям.
+
+        Точное значение кешируется в count_cache на count_cache_ttl секунд и
+        сбрасывается при любой записи в таблицу. В режиме estimate при отсутствии
+        свежего значения используется устаревшее из кеша, а без него и без
+        критериев фильтрации - max(id), который читается по индексу первичного
+        ключа. С критериями фильтрации max(id) не отражает их, поэтому тогда
+        выполняется точный подсчет.
+
+        Аргументы:
+            estimate: Если True, допускается приблизительное значение,
+            **kwargs: Критерии фильтрации в виде именованных параметров.
+
+        Возвращает:
+            Количество и признак того, что оно приблизительное.
+        """
+        table = self.model.__tablename__
+        count = count_cache.get(table, kwargs)
+        if count is not None:
+            return count, False
+
+        if estimate:
+            count = count_cache.get(table, kwargs, stale=True)
+            if count is not None:
+                return count, True
+            if not kwargs:
+                query = select(func.coalesce(func.max(self.model.id), 0))
+                return (await self.session.execute(query)).scalar_one(), True
+
+        query = select(func.count(self.model.id)).filter_by(**kwargs)
+        count = (await self.session.execute(query)).scalar_one()
+        count_cache.set(table, kwargs, count)
+        return count, False
+
+    async def _invalidate(self, *ids):
+        """
+        Сбрасывает кеши таблицы и указанных id после фиксации транзакции.
+
+        До коммита другие запросы видят старые данные и могли бы снова
+        положить их в кеш, поэтому сброс откладывается до commit сессии.
+        """
+        after_commit(self.session, partial(self._clear_caches, *ids))
+
+    async def _clear_caches(self, *ids):
+        count_cache.invalidate(self.model.__tablename__)
+        await entity_cache.invalidate(self.model.__tablename__, *ids)
+
+    def _cursor(self, entity) -> str:
+        return encode_cursor([getattr(entity, name) for name in self.cursor_columns])
+
+    def _cursor_values(self, cursor: list) -> list:
+        """
+        Приводит значения из курсора к типам колонок cursor_columns.
+
+        Возвращает:
+            Список значений; ValueError, если курсор не соответствует колонкам.
+        """
+        if len(cursor) != len(self.cursor_columns):
+            raise ValueError("Cursor does not match cursor columns")
+        values = []
+        for name, value in zip(self.cursor_columns, cursor):
+            python_type = getattr(self.model, name).type.python_type
+            if value is None or isinstance(value, bool):
+                raise ValueError("Invalid cursor value")
+            if python_type is int and isinstance(value, float):
+                if not value.is_integer():
+                    raise ValueError("Invalid cursor value")
+                value = int(value)
+            if not isinstance(value, python_type):
+                try:
+                    if hasattr(python_type, "fromisoformat"):
+                        value = python_type.fromisoformat(value)
+                    else:
+                        value = python_type(value)
+                except (TypeError, ArithmeticError) as e:
+                    raise ValueError("Invalid cursor value") from e
+            values.append(value)
+        return values
+
     async def add_one_and_return(self, **kwargs) -> Type[model]:
         """
         Асинхронно создает новый экземпляр модели с указанными значениями.
@@ -70,34 +391,193 @@ class BaseDAO:
             **kwargs: Именованные аргументы для создания нового экземпляра модели.
 
         Возвращает:
-            Созданный экземпляр модели.
+            Созданный экземпляр модели; UniqueViolationError, если значение
+            уникальной колонки уже занято.
         """
         query = insert(self.model).values(**kwargs).returning(self.model)
-        _obj: Result = await self.session.execute(query)
-        await self.session.commit()
+        with unique_violation():
+            _obj: Result = await self.session.execute(query)
+        await self.session.flush()
+        await self._invalidate()
         return _obj.unique().scalar_one()
 
-    async def update_one_by_id(self, _id: int, **values) -> Type[model]:
+    async def add_many(self, rows: list[dict[str, Any]]) -> list[int]:
+        """
+        Асинхронно создает пачку экземпляров модели в одной транзакции.
+
+        Выполняется как INSERT ... RETURNING id с несколькими строками VALUES
+        (insertmanyvalues) по таблице, без построения ORM объектов.
+
+        Аргументы:
+            rows: Список словарей со значениями колонок.
+
+        Возвращает:
+            Список id созданных экземпляров, порядок не гарантирован.
+        """
+        if not rows:
+            return []
+        table = self.model.__table__
+        # sort_by_parameter_order would make SQLite fall back to one row per INSERT
+        query = insert(table).returning(table.c.id)
+        result: Result = await self.session.execute(query, rows)
+        ids = list(result.scalars().all())
+        await self.session.flush()
+        await self._invalidate()
+        return ids
+
+    async def update_many_by_id(self, rows: list[dict[str, Any]]) -> list[int]:
+        """
+        Асинхронно обновляет пачку экземпляров модели по id в одной транзакции.
+
+        Строки с одинаковым набором колонок отправляются одним executemany
+        UPDATE по первичному ключу. Отсутствующие в таблице id пропускаются.
+
+        Аргументы:
+            rows: Список словарей, каждый с ключом "id" и новыми значениями.
+
+        Возвращает:
+            Список id обновленных экземпляров.
+        """
+        existing = set(await self.existing_ids([row["id"] for row in rows]))
+        rows = [row for row in rows if row["id"] in existing]
+        if not rows:
+            return []
+        await self.session.execute(update(self.model), rows)
+        await self.session.flush()
+        ids = [row["id"] for row in rows]
+        await self._invalidate(*ids)
+        return ids
+
+    async def upsert_many(
+        self, rows: list[dict[str, Any]], index_elements: Sequence[str] = ("id",)
+    ) -> list[int]:
+        """
+        Асинхронно вставляет или обновляет пачку экземпляров модели в одной транзакции.
+
+        Выполняется как INSERT ... ON CONFLICT (index_elements) DO UPDATE
+        ... RETURNING id, по одному запросу на каждый набор колонок в rows.
+        Поддерживаются SQLite и PostgreSQL.
+
+        Аргументы:
+            rows: Список словарей со значениями колонок.
+            index_elements: Уникальные колонки, по которым определяется конфликт.
+
+        Возвращает:
+            Список id созданных и обновленных экземпляров.
+        """
+        dialect = self.session.bind.dialect.name
+        if dialect == "sqlite":
+            insert_ = sqlite.insert
+        elif dialect == "postgresql":
+            insert_ = postgresql.insert
+        else:
+            raise NotImplementedError(f"Upsert is not supported for {dialect}")
+
+        groups: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        table = self.model.__table__
+        ids = []
+        for columns, group in groups.items():
+            query = insert_(table)
+            set_ = {
+                name: query.excluded[name]
+                for name in columns
+                if name not in index_elements
+            }
+            if set_:
+                if "updated" in table.c:
+                    set_["updated"] = utc_now()
+                query = query.on_conflict_do_update(
+                    index_elements=index_elements, set_=set_
+                )
+            else:
+                query = query.on_conflict_do_nothing(index_elements=index_elements)
+            result: Result = await self.session.execute(
+                query.returning(table.c.id), group
+            )
+            ids.extend(result.scalars().all())
+        await self.session.flush()
+        await self._invalidate(*ids)
+        return ids
+
+    async def delete_many_by_id(self, ids: Sequence[int]) -> list[int]:
+        """
+        Асинхронно удаляет пачку экземпляров модели по id в одной транзакции.
+
+        Аргументы:
+            ids: Список id.
+
+        Возвращает:
+            Список id удаленных экземпляров.
+        """
+        deleted_ids = []
+        for chunk in self._chunks(ids):
+            query = (
+                delete(self.model)
+                .where(self.model.id.in_(chunk))
+                .returning(self.model.id)
+            )
+            result = await self.session.execute(query)
+            deleted_ids.extend(result.scalars().all())
+        await self.session.flush()
+        await self._invalidate(*deleted_ids)
+        return deleted_ids
+
+    async def existing_ids(self, ids: Sequence[int]) -> list[int]:
+        """
+        Асинхронно возвращает те из указанных id, которые есть в таблице.
+
+        Аргументы:
+            ids: Список id.
+
+        Возвращает:
+            Список найденных id.
+        """
+        found = []
+        for chunk in self._chunks(ids):
+            query = select(self.model.id).where(self.model.id.in_(chunk))
+            found.extend((await self.session.execute(query)).scalars().all())
+        return found
+
+    @staticmethod
+    def _chunks(values: Sequence, size: int | None = None):
+        # keeps IN (...) lists below the driver's bound parameter limit
+        size = size or settings.bulk_chunk_size
+        values = list(values)
+        for start in range(0, len(values), size):
+            yield values[start : start + size]
+
+    async def update_one_by_id(self, _id: int, *where, **values) -> Type[model]:
         """
         Асинхронно обновляет экземпляр модели, удовлетворяющий критерию,
         новыми значениями, указанными в values.
 
+        Проверка существования и обновление выполняются одним UPDATE ... RETURNING.
+
         Аргументы:
             id: Критерии фильтрации в виде именованного параметра.
+            *where: Дополнительные условия, при которых выполняется обновление.
             **values: Именованные параметры для обновления значений экземпляров модели.
 
         Возвращает:
-            Обновленный экземпляр модели.
+            Обновленный экземпляр модели или None, если подходящей записи нет;
+            UniqueViolationError, если значение уникальной колонки уже занято.
         """
         query = (
             update(self.model)
-            .filter(self.model.id == _id)
+            .filter(self.model.id == _id, *where)
             .values(**values)
             .returning(self.model)
         )
-        _obj: Result | None = await self.session.execute(query)
-        await self.session.commit()
-        return _obj.unique().scalar_one_or_none()
+        with unique_violation():
+            _obj: Result | None = await self.session.execute(query)
+        await self.session.flush()
+        entity = _obj.unique().scalar_one_or_none()
+        if entity is not None:
+            await self._invalidate(_id)
+        return entity
 
     async def delete(self, delete_all: bool = False, **filter_by):
         """
@@ -117,8 +597,10 @@ class BaseDAO:
                     "Необходимо указать хотя бы один параметр для удаления."
                 )
 
-        query = delete(self.model).filter_by(**filter_by)
+        query = delete(self.model).filter_by(**filter_by).returning(self.model.id)
         result = await self.session.execute(query)
-        await self.session.commit()
+        deleted_ids = result.scalars().all()
+        await self.session.flush()
+        await self._invalidate(*deleted_ids)
 
-        return result.rowcount
+        return len(deleted_ids)
@@ -1,40 +1,113 @@
-from sqlalchemy import select, desc, or_
-from sqlalchemy.engine import Result
-from sqlalchemy.orm import joinedload
+from sqlalchemy import and_, insert, select, true, union_all
+from sqlalchemy.orm import aliased
 
 from dao.base import BaseDAO
+from helpers.paginator import encode_cursor
 from models import chat as models
+from models.user import User
 
 
 class MessageDAO(BaseDAO):
     model = models.Message
 
-    async def get_chat(self, user_id: int, limit: int = 5):
+    async def get_chat(
+        self,
+        user_id: int,
+        limit: int = 5,
+        before: list | None = None,
+        after: list | None = None,
+    ) -> tuple[list[dict], str | None, str | None]:
         """
-        Асинхронно находит и возвращает все экземпляры модели, удовлетворяющие указанным критериям.
+        Асинхронно возвращает страницу истории чата, видимой пользователю, от новых к старым.
+
+        Видимость разбита на три непересекающихся условия (общие сообщения,
+        входящие и исходящие личные), каждое читается своим поиском по
+        составному индексу с ORDER BY id и LIMIT, результаты объединяются
+        через UNION ALL. Поэтому стоимость страницы не зависит от размера
+        истории. Из пользователей читаются только имена.
 
         Аргументы:
-            user_id:получатель сообщений
-            limit: Критерии кол-ва объектов
+            user_id: Идентификатор пользователя, для которого строится история.
+            limit: Количество сообщений на странице.
+            before: Курсор, вернуть сообщения старше него.
+            after: Курсор, вернуть сообщения новее него.
 
         Возвращает:
-            Словарь со списком экземпляров модели.
+            Список сообщений в виде словарей с полями MessageResponse, курсор
+            для более старых и курсор для более новых сообщений (None, если их нет).
         """
+        model = self.model
+        conditions = [
+            model.receiver_id.is_(None),
+            model.receiver_id == user_id,
+            and_(
+                model.sender_id == user_id,
+                model.receiver_id.is_not(None),
+                model.receiver_id != user_id,
+            ),
+        ]
+        if after is not None:
+            (cursor_id,) = self._cursor_values(after)
+            seek, order = model.id > cursor_id, model.id.asc()
+        else:
+            seek, order = true(), model.id.desc()
+            if before is not None:
+                (cursor_id,) = self._cursor_values(before)
+                seek = model.id < cursor_id
+        branches = [
+            select(
+                select(model.id)
+                .where(condition, seek)
+                .order_by(order)
+                .limit(limit + 1)
+                .subquery()
+                .c.id
+            )
+            for condition in conditions
+        ]
+        ids = union_all(*branches).subquery()
+
+        sender, receiver = aliased(User), aliased(User)
         query = (
-            (
-                select(self.model)
-                .options(joinedload(self.model.sender))
-                .options(joinedload(self.model.receiver))
-                .where(
-                    or_(
-                        self.model.sender_id == user_id,
-                        self.model.receiver_id.is_(None),
-                        self.model.receiver_id == user_id,
-                    )
-                )
+            select(
+                model.id,
+                model.text,
+                model.created,
+                sender.username.label("sender"),
+                receiver.username.label("receiver"),
             )
-            .order_by(desc(self.model.created))
-            .limit(limit)
+            .join(ids, ids.c.id == model.id)
+            .join(sender, sender.id == model.sender_id)
+            .outerjoin(receiver, receiver.id == model.receiver_id)
+            .order_by(ids.c.id.asc() if after is not None else ids.c.id.desc())
+            .limit(limit + 1)
         )
-        result: Result = await self.session.execute(query)
-        return result.scalars().all()
+        rows = (await self.session.execute(query)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is not None:
+            rows.reverse()
+        has_older = has_more if after is None else True
+        has_newer = has_more if after is not None else before is not None
+
+        messages = [row._asdict() for row in rows]
+        older = encode_cursor([rows[-1].id]) if rows and has_older else None
+        newer = encode_cursor([rows[0].id]) if rows and has_newer else None
+        return messages, older, newer
+
+    async def insert_many(self, rows: list[dict]) -> int:
+        """
+        Асинхронно вставляет пачку сообщений одним INSERT ... VALUES.
+
+        Аргументы:
+            rows: Список словарей со значениями колонок.
+
+        Возвращает:
+            Количество вставленных сообщений.
+        """
+        if not rows:
+            return 0
+        await self.session.execute(insert(self.model).values(rows))
+        await self.session.flush()
+        await self._invalidate()
+        return len(rows)
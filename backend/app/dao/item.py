@@ -1,6 +1,121 @@
+import re
+from typing import Sequence
+
+from pydantic import BaseModel
+from sqlalchemy import column, func, literal_column, or_, select, table
+
 from dao.base import BaseDAO
 from models import item as models
+from schemas import item as schemas
+
+SEARCH_WORD_RE = re.compile(r"\w+")
+
+item_fts = table("item_fts", column("rowid"), column("rank"))
+
+
+def match_expression(words: Sequence[str], prefix: bool = False) -> str:
+    """FTS5 query matching all words, the last one as a prefix with prefix."""
+    terms = [f'"{word}"' for word in words]
+    if prefix:
+        terms[-1] += "*"
+    return " ".join(terms)
 
 
 class ItemsDAO(BaseDAO):
     model = models.Item
+    response_schema = schemas.ItemResponse
+
+    async def count_image_references(self, images: Sequence[str]) -> dict[str, int]:
+        """
+        Асинхронно считает, сколько экземпляров ссылается на каждое изображение.
+
+        Аргументы:
+            images: Список имен изображений.
+
+        Возвращает:
+            Словарь {имя изображения: число ссылок}, без изображений без ссылок.
+        """
+        references = {}
+        for chunk in self._chunks(images):
+            query = (
+                select(self.model.image, func.count())
+                .where(self.model.image.in_(chunk))
+                .group_by(self.model.image)
+            )
+            references.update((await self.session.execute(query)).tuples().all())
+        return references
+
+    async def search(
+        self,
+        text: str | None,
+        limit: int,
+        offset: int = 1,
+        prefix: bool = False,
+        price_min: float | None = None,
+        price_max: float | None = None,
+        sort: schemas.ItemSearchSort = "rank",
+        schema: type[BaseModel] | None = None,
+    ) -> tuple[list[BaseModel], bool]:
+        """
+        Асинхронно ищет экземпляры по словам в name и description.
+
+        В SQLite поиск идет по FTS5 таблице item_fts, "rank" сортирует по
+        релевантности (bm25). С prefix и в других базах, где слова ищутся через
+        ILIKE, "rank" означает "newest". Фильтры и сортировки по цене и имени используют индексы
+        ix_item_price_id и ix_item_name_id.
+
+        Аргументы:
+            text: Искомые слова, все должны встретиться,
+            limit: Количество объектов на странице,
+            offset: Номер страницы,
+            prefix: Последнее слово ищется как префикс (автодополнение),
+            price_min: Минимальная цена,
+            price_max: Максимальная цена,
+            sort: Порядок: "rank", "price", "-price", "name" или "newest",
+            schema: Pydantic схема ответа, по умолчанию response_schema.
+
+        Возвращает:
+            Список экземпляров схемы и признак наличия следующей страницы.
+        """
+        schema = schema or self.response_schema
+        query = select(*self._projection(schema))
+        words = SEARCH_WORD_RE.findall(text or "")
+        full_text = bool(words) and self.session.get_bind().dialect.name == "sqlite"
+        if full_text:
+            query = query.join(item_fts, item_fts.c.rowid == self.model.id).where(
+                literal_column("item_fts").op("MATCH")(match_expression(words, prefix))
+            )
+        else:
+            # substring matches already cover prefixes
+            for word in words:
+                query = query.where(
+                    or_(
+                        self.model.name.icontains(word),
+                        self.model.description.icontains(word),
+                    )
+                )
+        if price_min is not None:
+            query = query.where(self.model.price >= price_min)
+        if price_max is not None:
+            query = query.where(self.model.price <= price_max)
+
+        # ranking a prefix ranks every word it expands to, autocomplete lists the
+        # newest matches instead, which FTS5 returns in rowid order without sorting
+        if sort == "rank" and (prefix or not full_text):
+            sort = "newest"
+        order_by = {
+            "rank": [item_fts.c.rank],
+            "price": [self.model.price],
+            "-price": [self.model.price.desc()],
+            "name": [self.model.name],
+            # the FTS rowid order lets SQLite stop after limit matches
+            "newest": [(item_fts.c.rowid if full_text else self.model.id).desc()],
+        }[sort]
+        if sort != "newest":
+            order_by.append(self.model.id.desc() if sort == "-price" else self.model.id)
+        # one extra row tells whether a next page exists
+        query = query.order_by(*order_by).offset((offset - 1) * limit).limit(limit + 1)
+
+        rows = (await self.session.execute(query)).all()
+        entities = [schema.model_validate(row._mapping) for row in rows[:limit]]
+        return entities, len(rows) > limit
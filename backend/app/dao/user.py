@@ -1,33 +1,63 @@
 from typing import Type
 
-from sqlalchemy import update
+from sqlalchemy import select, update
 from sqlalchemy.engine import Result
 
-from dao.base import BaseDAO
+from dao.base import BaseDAO, unique_violation
+from helpers.cache import user_directory
 from models import user as models
+from schemas import user as schemas
 
 
 class UserDAO(BaseDAO):
     model = models.User
+    response_schema = schemas.UserResponse
 
-    async def update_one_by_name(self, name: str, **values) -> Type[model]:
+    async def get_id_by_username(self, username: str) -> int | None:
+        """
+        Асинхронно возвращает идентификатор пользователя по имени, используя user_directory.
+
+        Аргументы:
+            username: Имя пользователя.
+
+        Возвращает:
+            Идентификатор или None, если пользователь не найден.
+        """
+        _id = user_directory.get_id(username)
+        if _id is not None:
+            return _id
+        query = select(self.model.id).filter_by(username=username)
+        _id = (await self.session.execute(query)).scalar_one_or_none()
+        if _id is not None:
+            user_directory.set(username, _id)
+        return _id
+
+    async def _clear_caches(self, *ids):
+        user_directory.forget(*ids)
+        await super()._clear_caches(*ids)
+
+    async def update_one_by_name(self, name: str, *where, **values) -> Type[model]:
         """
         Асинхронно обновляет экземпляр модели, удовлетворяющий критерию,
         новыми значениями, указанными в values.
 
         Аргументы:
             name: Критерии фильтрации в виде именованного параметра.
+            *where: Дополнительные условия, при которых выполняется обновление.
             **values: Именованные параметры для обновления значений экземпляров модели.
 
         Возвращает:
-            Обновленный экземпляр модели.
+            Обновленный экземпляр модели или None, если подходящей записи нет.
         """
         query = (
             update(self.model)
-            .filter(self.model.username == name)
+            .filter(self.model.username == name, *where)
             .values(**values)
             .returning(self.model)
         )
-        _obj: Result | None = await self.session.execute(query)
-        await self.session.commit()
-        return _obj.unique().scalar_one_or_none()
+        with unique_violation():
+            _obj: Result | None = await self.session.execute(query)
+        await self.session.flush()
+        entity = _obj.unique().scalar_one_or_none()
+        await self._invalidate(*([entity.id] if entity else []))
+        return entity
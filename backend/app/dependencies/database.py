@@ -1,16 +1,32 @@
 from typing import AsyncGenerator, Any
 
+from fastapi.requests import HTTPConnection
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
 
-from core.database import async_db_session
+from core.database import async_db_session, commit, rollback
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, Any]:
+async def get_db(connection: HTTPConnection) -> AsyncGenerator[AsyncSession, Any]:
     """
     Returns a database Session for use with fastapi Depends
+
+    The session is the request's unit of work: DAOs only flush, and the
+    transaction is committed once the endpoint returns, or rolled back if it
+    raises. Depend on it with `scope="function"` so the commit happens before
+    the response is sent; the default request scope commits after it.
+
+    Reads go to a replica unless the request sends `X-Read-Primary: 1`,
+    e.g. to read what it has just written in a previous request.
     """
 
     async with async_db_session() as session:
-        yield session
+        if connection.headers.get("x-read-primary", "").lower() in ("1", "true"):
+            session.info["primary"] = True
+        try:
+            yield session
+        except Exception:
+            await rollback(session)
+            raise
+        await commit(session)
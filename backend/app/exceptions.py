@@ -17,6 +17,11 @@ CREDENTIALS_EXCEPTION_EXPIRED = HTTPException(
     detail="Access Token expired",
     headers={"WWW-Authenticate": "Bearer"},
 )
+CREDENTIALS_EXCEPTION_REVOKED = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Access Token revoked",
+    headers={"WWW-Authenticate": "Bearer"},
+)
 CREDENTIALS_EXCEPTION_USER = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
     detail="Token dont have an user",
@@ -45,7 +50,7 @@ AUTH_EXCEPTION_CONFLICT_USERNAME = HTTPException(
 
 AUTH_EXCEPTION_CONFLICT_EMAIL = HTTPException(
     status_code=status.HTTP_409_CONFLICT,
-    detail="Username already registered",
+    detail="Email already registered",
 )
 
 AUTH_EXCEPTION_CREATE_USER = HTTPException(
@@ -53,6 +58,20 @@ AUTH_EXCEPTION_CREATE_USER = HTTPException(
     detail="Bad request",
 )
 
+PAGE_EXCEPTION_INVALID_CURSOR = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Invalid pagination cursor",
+)
+
+BULK_EXCEPTION_INVALID_BODY = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Expected a JSON array or NDJSON rows",
+)
+BULK_EXCEPTION_TOO_LARGE = HTTPException(
+    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    detail="Too many rows in one bulk request",
+)
+
 USER_EXCEPTION_NOT_FOUND_USER = HTTPException(
     status_code=status.HTTP_404_NOT_FOUND,
     detail="User not found",
@@ -74,3 +93,11 @@ ITEM_EXCEPTION_IMAGE = HTTPException(
     status_code=status.HTTP_400_BAD_REQUEST,
     detail="Cant upload image",
 )
+UPLOAD_EXCEPTION_TOO_LARGE = HTTPException(
+    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    detail="Uploaded file is too large",
+)
+MEDIA_EXCEPTION_NOT_FOUND = HTTPException(
+    status_code=status.HTTP_404_NOT_FOUND,
+    detail="Media not found",
+)
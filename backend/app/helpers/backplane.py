@@ -0,0 +1,310 @@
+import asyncio
+import fcntl
+import os
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Awaitable, Callable
+
+import orjson
+
+from core.conf import settings, logger
+
+Handler = Callable[[dict[str, Any]], Awaitable[None]]
+
+# frames are newline delimited orjson documents, orjson never emits raw newlines
+FRAME_LIMIT = 2**20
+
+
+class Backplane(ABC):
+    """
+    Pub/sub channel shared by all ConnectionManager instances.
+
+    Every published message is handed to the handler of every subscribed
+    process, including the publisher. The backplane also keeps the registry
+    of online usernames across processes.
+    """
+
+    def __init__(self):
+        self._handler: Handler | None = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    @abstractmethod
+    async def publish(self, message: dict[str, Any]): ...
+
+    @abstractmethod
+    async def join(self, username: str): ...
+
+    @abstractmethod
+    async def leave(self, username: str): ...
+
+    @abstractmethod
+    def online_users(self) -> list[str]: ...
+
+
+class InProcessBackplane(Backplane):
+    """Backplane for a single worker, messages never leave the process."""
+
+    def __init__(self):
+        super().__init__()
+        self._users: Counter[str] = Counter()
+
+    async def publish(self, message: dict[str, Any]):
+        if self._handler is not None:
+            await self._handler(message)
+
+    async def join(self, username: str):
+        self._users[username] += 1
+
+    async def leave(self, username: str):
+        self._users[username] -= 1
+        if self._users[username] <= 0:
+            del self._users[username]
+
+    def online_users(self) -> list[str]:
+        return list(self._users)
+
+
+def _dump(frame: dict[str, Any]) -> bytes:
+    return orjson.dumps(frame) + b"\n"
+
+
+class UnixSocketBroker:
+    """
+    Relay between the workers of one host, listening on a Unix socket.
+
+    Forwards every published message to all connected workers and tracks
+    which users are online on which worker. A worker that disconnects takes
+    its users offline.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._server: asyncio.Server | None = None
+        self._clients: dict[asyncio.StreamWriter, Counter[str]] = {}
+        self._totals: Counter[str] = Counter()
+        self._closing = False
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(
+            self._handle, self.path, limit=FRAME_LIMIT
+        )
+
+    async def stop(self):
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _send_all(self, frame: dict[str, Any]):
+        data = _dump(frame)
+        writers = list(self._clients)
+        for writer in writers:
+            writer.write(data)
+        await asyncio.gather(
+            *(writer.drain() for writer in writers), return_exceptions=True
+        )
+
+    async def _add(self, users: Counter[str], username: str, count: int = 1):
+        users[username] += count
+        self._totals[username] += count
+        if self._totals[username] == count:
+            await self._send_all({"op": "online", "user": username})
+
+    async def _remove(self, users: Counter[str], username: str, count: int = 1):
+        count = min(count, users[username])
+        if count <= 0:
+            return
+        users[username] -= count
+        if users[username] <= 0:
+            del users[username]
+        self._totals[username] -= count
+        if self._totals[username] <= 0:
+            del self._totals[username]
+            await self._send_all({"op": "offline", "user": username})
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        users: Counter[str] = Counter()
+        self._clients[writer] = users
+        writer.write(_dump({"op": "presence", "users": list(self._totals)}))
+        try:
+            while line := await reader.readline():
+                try:
+                    frame = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    logger.warning("Backplane broker got a malformed frame")
+                    continue
+                op = frame.get("op")
+                if op == "publish":
+                    await self._send_all({"op": "message", "message": frame["message"]})
+                elif op == "join":
+                    await self._add(users, frame["user"])
+                elif op == "leave":
+                    await self._remove(users, frame["user"])
+                elif op == "sync":
+                    for username, count in frame["users"].items():
+                        await self._add(users, username, count)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Backplane client dropped: {e}")
+        finally:
+            del self._clients[writer]
+            if not self._closing:
+                for username, count in list(users.items()):
+                    await self._remove(users, username, count)
+            writer.close()
+
+
+class UnixSocketBackplane(Backplane):
+    """
+    Backplane for several workers on one host.
+
+    The first worker that takes an exclusive lock on `<path>.lock` runs the
+    UnixSocketBroker, every worker (the broker included) connects to it as a
+    client. When the broker worker exits, the lock is released and the
+    remaining workers elect a new broker on reconnect.
+
+    params:
+        - path: Unix socket path shared by the workers
+        - retry_interval: seconds between reconnection attempts
+    """
+
+    def __init__(self, path: str, retry_interval: float = 0.5):
+        super().__init__()
+        self.path = path
+        self.retry_interval = retry_interval
+        self._broker: UnixSocketBroker | None = None
+        self._lock_fd: int | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+        self._connected = asyncio.Event()
+        self._local: Counter[str] = Counter()
+        self._online: set[str] = set()
+
+    async def start(self, handler: Handler, timeout: float = 5.0):
+        await super().start(handler)
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except TimeoutError:
+            logger.error(f"Backplane {self.path} is not reachable yet")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                logger.exception("Backplane task failed")
+            self._task = None
+        if self._broker is not None:
+            await self._broker.stop()
+            self._broker = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        await super().stop()
+
+    async def _elect_broker(self):
+        if self._broker is not None:
+            return
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        self._broker = UnixSocketBroker(self.path)
+        await self._broker.start()
+        logger.info(f"Backplane broker listening on {self.path}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self._elect_broker()
+                reader, writer = await asyncio.open_unix_connection(
+                    self.path, limit=FRAME_LIMIT
+                )
+            except OSError:
+                await asyncio.sleep(self.retry_interval)
+                continue
+
+            writer.write(_dump({"op": "sync", "users": dict(self._local)}))
+            self._writer = writer
+            self._connected.set()
+            try:
+                while line := await reader.readline():
+                    try:
+                        await self._dispatch(orjson.loads(line))
+                    except Exception:
+                        logger.exception("Backplane frame dispatch failed")
+            except (ConnectionError, ValueError) as e:
+                logger.warning(f"Backplane connection lost: {e}")
+            finally:
+                self._writer = None
+                self._connected.clear()
+                self._online = set(self._local)
+                writer.close()
+            await asyncio.sleep(self.retry_interval)
+
+    async def _dispatch(self, frame: dict[str, Any]):
+        op = frame.get("op")
+        if op == "message":
+            if self._handler is not None:
+                await self._handler(frame["message"])
+        elif op == "presence":
+            self._online = set(frame["users"]) | set(self._local)
+        elif op == "online":
+            self._online.add(frame["user"])
+        elif op == "offline":
+            self._online.discard(frame["user"])
+
+    async def _send(self, frame: dict[str, Any]) -> bool:
+        if self._writer is None:
+            return False
+        try:
+            self._writer.write(_dump(frame))
+            await self._writer.drain()
+        except ConnectionError:
+            return False
+        return True
+
+    async def publish(self, message: dict[str, Any]):
+        if not await self._send({"op": "publish", "message": message}):
+            logger.warning("Backplane is down, delivering to local sockets only")
+            if self._handler is not None:
+                await self._handler(message)
+
+    async def join(self, username: str):
+        self._local[username] += 1
+        self._online.add(username)
+        await self._send({"op": "join", "user": username})
+
+    async def leave(self, username: str):
+        self._local[username] -= 1
+        if self._local[username] <= 0:
+            del self._local[username]
+        if not await self._send({"op": "leave", "user": username}):
+            if username not in self._local:
+                self._online.discard(username)
+
+    def online_users(self) -> list[str]:
+        return list(self._online)
+
+
+def create_backplane() -> Backplane:
+    if settings.chat_backplane == "unix":
+        return UnixSocketBackplane(settings.chat_backplane_path)
+    return InProcessBackplane()
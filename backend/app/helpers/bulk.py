@@ -0,0 +1,69 @@
+from typing import Any
+
+import orjson
+from fastapi import Request
+from pydantic import BaseModel, ValidationError
+
+import exceptions
+from core.conf import settings
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def bulk_rows(request: Request) -> list[tuple[int, Any]]:
+    """
+    Dependency, reads a bulk request body.
+
+    Accepts a JSON array, or NDJSON (one JSON document per line) when the
+    content type says so. Returns the rows with their position in the body,
+    a line that is not valid JSON becomes an exception in place of the row,
+    so it is reported as a per-row error.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append((len(rows), orjson.loads(line)))
+            except orjson.JSONDecodeError as e:
+                rows.append((len(rows), e))
+    else:
+        try:
+            values = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            raise exceptions.BULK_EXCEPTION_INVALID_BODY
+        if not isinstance(values, list):
+            raise exceptions.BULK_EXCEPTION_INVALID_BODY
+        rows = list(enumerate(values))
+    if len(rows) > settings.bulk_max_rows:
+        raise exceptions.BULK_EXCEPTION_TOO_LARGE
+    return rows
+
+
+def validate_rows(
+    rows: list[tuple[int, Any]], schema: type[BaseModel]
+) -> tuple[list[tuple[int, BaseModel]], list[dict[str, Any]]]:
+    """
+    Validates bulk rows against schema.
+
+    Returns the valid rows with their index and the errors of the invalid ones
+    as {"index": ..., "detail": ...}.
+    """
+    valid, errors = [], []
+    for index, value in rows:
+        if isinstance(value, Exception):
+            errors.append({"index": index, "detail": f"Invalid JSON: {value}"})
+            continue
+        try:
+            valid.append((index, schema.model_validate(value)))
+        except ValidationError as e:
+            errors.append(
+                {
+                    "index": index,
+                    "detail": e.errors(include_url=False, include_context=False),
+                }
+            )
+    return valid, errors
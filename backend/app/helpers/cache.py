@@ -0,0 +1,270 @@
+import itertools
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+from core.conf import settings
+
+
+class CountCache:
+    """
+    Cache of `SELECT count(...)` results for paginated listings.
+
+    Entries are grouped by table name, so every write to a table drops all its
+    cached counts at once. Expired entries are still kept until evicted,
+    which lets callers fall back to a stale count when an estimate is enough.
+
+    params:
+        - ttl: seconds during which a count is considered exact
+        - maxsize: maximum number of filter combinations kept per table
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: dict[str, dict[tuple, tuple[float, int]]] = {}
+
+    @staticmethod
+    def make_key(filters: dict[str, Any]) -> tuple | None:
+        key = tuple(sorted(filters.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, table: str, filters: dict[str, Any], stale: bool = False):
+        key = self.make_key(filters)
+        entry = self._entries.get(table, {}).get(key)
+        if entry is None:
+            return None
+        stored_at, count = entry
+        if not stale and time.monotonic() - stored_at > self.ttl:
+            return None
+        return count
+
+    def set(self, table: str, filters: dict[str, Any], count: int):
+        key = self.make_key(filters)
+        if key is None or self.maxsize <= 0:
+            return
+        entries = self._entries.setdefault(table, {})
+        entries.pop(key, None)
+        if len(entries) >= self.maxsize:
+            del entries[next(iter(entries))]
+        entries[key] = (time.monotonic(), count)
+
+    def invalidate(self, table: str):
+        self._entries.pop(table, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+count_cache = CountCache(
+    ttl=settings.count_cache_ttl, maxsize=settings.count_cache_size
+)
+
+
+class CacheBackend(ABC):
+    """
+    Async storage interface of the entity cache.
+
+    A key addresses one entity (`<table>:<id>`), and each key holds several
+    fields, one per set of extra lookup filters, so deleting the key
+    invalidates every cached variant of the entity at once. A field expires
+    `ttl` seconds after it is set.
+    """
+
+    @abstractmethod
+    async def get(self, key: str, field: str) -> bytes | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, field: str, value: bytes, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+
+class LRUCacheBackend(CacheBackend):
+    """
+    Bounded in-process backend, evicts the least recently used entity.
+
+    params:
+        - maxsize: maximum number of entities kept
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, dict[str, tuple[float, bytes]]] = OrderedDict()
+
+    async def get(self, key: str, field: str) -> bytes | None:
+        fields = self._entries.get(key)
+        if fields is None or field not in fields:
+            return None
+        expires_at, value = fields[field]
+        if expires_at < time.monotonic():
+            del fields[field]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, field: str, value: bytes, ttl: float) -> None:
+        if self.maxsize <= 0:
+            return
+        fields = self._entries.get(key)
+        if fields is None:
+            fields = self._entries[key] = {}
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        fields[field] = (time.monotonic() + ttl, value)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Unbounded backend over a plain dict, a stand-in for tests."""
+
+    def __init__(self):
+        self.entries: dict[str, dict[str, tuple[float, bytes]]] = {}
+
+    async def get(self, key: str, field: str) -> bytes | None:
+        entry = self.entries.get(key, {}).get(field)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    async def set(self, key: str, field: str, value: bytes, ttl: float) -> None:
+        self.entries.setdefault(key, {})[field] = (time.monotonic() + ttl, value)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+
+class EntityCache:
+    """
+    Read-through cache of serialized response schemas by primary key, each
+    stored with the `updated` value of its row.
+
+    Every invalidation gives the key a new generation. A reader takes the
+    generation before loading from the database and `set` skips the write if
+    it changed meanwhile, so a load that raced with a write can not put the
+    old payload back. Generations and invalidation are per process: with the
+    LRU backend other workers keep their copy until `ttl` expires.
+
+    params:
+        - backend: CacheBackend implementation, can be replaced at runtime
+        - ttl: seconds a cached payload lives
+        - maxsize: number of recently invalidated keys whose generation is kept
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, maxsize: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._counter = itertools.count(1)
+        self._generations: OrderedDict[str, int] = OrderedDict()
+
+    def generation(self, table: str, _id: Any) -> int:
+        return self._generations.get(self.make_key(table, _id), 0)
+
+    @staticmethod
+    def make_key(table: str, _id: Any) -> str:
+        return f"{table}:{_id}"
+
+    @staticmethod
+    def make_field(filters: dict[str, Any]) -> str:
+        return "&".join(f"{k}={v}" for k, v in sorted(filters.items()))
+
+    async def get(self, table: str, _id: Any, filters: dict[str, Any]):
+        return await self.backend.get(
+            self.make_key(table, _id), self.make_field(filters)
+        )
+
+    async def set(
+        self,
+        table: str,
+        _id: Any,
+        filters: dict[str, Any],
+        value: bytes,
+        generation: int,
+    ):
+        key = self.make_key(table, _id)
+        # issued generations start at 1, so a reader that saw one never matches
+        # the 0 of a key that was invalidated again and then forgotten
+        if self._generations.get(key, 0) != generation:
+            return
+        await self.backend.set(key, self.make_field(filters), value, self.ttl)
+
+    async def invalidate(self, table: str, *ids: Any):
+        keys = [self.make_key(table, _id) for _id in ids]
+        for key in keys:
+            self._generations[key] = next(self._counter)
+            self._generations.move_to_end(key)
+            if len(self._generations) > self.maxsize:
+                self._generations.popitem(last=False)
+        if keys:
+            await self.backend.delete(*keys)
+
+
+class UserDirectory:
+    """
+    Bounded two-way map of username and user id, per process.
+
+    Filled lazily by lookups and by websocket connects. UserDAO forgets an
+    id on every write to that user, which covers renames and soft deletes.
+
+    params:
+        - maxsize: maximum number of users kept
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._ids: OrderedDict[str, int] = OrderedDict()
+        self._names: dict[int, str] = {}
+
+    def get_id(self, username: str) -> int | None:
+        _id = self._ids.get(username)
+        if _id is not None:
+            self._ids.move_to_end(username)
+        return _id
+
+    def get_username(self, _id: int) -> str | None:
+        return self._names.get(_id)
+
+    def set(self, username: str, _id: int):
+        if self.maxsize <= 0:
+            return
+        # a renamed user leaves no entry under the old name
+        previous = self._names.pop(_id, None)
+        if previous is not None and self._ids.get(previous) == _id:
+            del self._ids[previous]
+        # and a name taken over from another id no longer resolves that id
+        owner = self._ids.pop(username, None)
+        if owner is not None and owner != _id:
+            self._names.pop(owner, None)
+        self._ids[username] = _id
+        self._names[_id] = username
+        if len(self._ids) > self.maxsize:
+            _, evicted = self._ids.popitem(last=False)
+            self._names.pop(evicted, None)
+
+    def forget(self, *ids: int):
+        for _id in ids:
+            username = self._names.pop(_id, None)
+            if username is not None and self._ids.get(username) == _id:
+                del self._ids[username]
+
+
+entity_cache = EntityCache(
+    LRUCacheBackend(maxsize=settings.entity_cache_size),
+    ttl=settings.entity_cache_ttl,
+    maxsize=settings.entity_cache_size,
+)
+
+user_directory = UserDirectory(maxsize=settings.user_directory_size)
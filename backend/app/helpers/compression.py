@@ -0,0 +1,328 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.conf import settings
+
+try:
+    import brotli
+except ImportError:  # optional, "br" is then not offered
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # optional, "zstd" is then not offered
+    zstandard = None
+
+
+class Encoder:
+    """One content coding, compresses whole bodies or a stream of chunks."""
+
+    def __init__(self, name: str, level: int):
+        self.name = name
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        stream = self.stream()
+        return stream.compress(data) + stream.finish()
+
+    def stream(self) -> "StreamCompressor":
+        return StreamCompressor(self)
+
+
+class StreamCompressor:
+    """Compresses chunks as they come, each chunk is flushed to the client."""
+
+    def __init__(self, encoder: Encoder):
+        self.name = encoder.name
+        if self.name == "gzip":
+            self._obj = zlib.compressobj(encoder.level, zlib.DEFLATED, 31)
+        elif self.name == "br":
+            self._obj = brotli.Compressor(quality=encoder.level)
+        else:
+            self._obj = zstandard.ZstdCompressor(level=encoder.level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.name == "br":
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        if self.name == "gzip":
+            return self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.name == "br":
+            return self._obj.flush()
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.name == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def available_encoders(names: list[str], levels: dict[str, int]) -> list[Encoder]:
+    """Encoders for names whose library is installed, in the given order."""
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [Encoder(name, levels[name]) for name in names if installed.get(name)]
+
+
+def negotiate(accept_encoding: str, encoders: list[Encoder]) -> Encoder | None:
+    """Picks the client's highest rated encoding, ties go to the server's order."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        accepted[name.strip()] = quality
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoder in encoders:
+        quality = accepted.get(encoder.name, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoder, quality
+    return best
+
+
+class CompressedCache:
+    """
+    LRU cache of compressed bodies, keyed by encoding and body digest.
+
+    params:
+        - maxbytes: maximum total size of the cached compressed bodies
+    """
+
+    def __init__(self, maxbytes: int):
+        self.maxbytes = maxbytes
+        self.size = 0
+        self._entries: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(encoding: str, body: bytes) -> tuple[str, bytes]:
+        return encoding, hashlib.blake2b(body, digest_size=16).digest()
+
+    def get(self, key: tuple[str, bytes]) -> bytes | None:
+        compressed = self._entries.get(key)
+        if compressed is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return compressed
+
+    def set(self, key: tuple[str, bytes], compressed: bytes):
+        if len(compressed) > self.maxbytes // 8 or key in self._entries:
+            return
+        self._entries[key] = compressed
+        self.size += len(compressed)
+        while self.size > self.maxbytes:
+            self.size -= len(self._entries.popitem(last=False)[1])
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ResponseCompressor:
+    """
+    Compression policy and counters of the CompressionMiddleware.
+
+    Only responses whose media type is in `content_types` and whose body is at
+    least `minimum_size` bytes are compressed; streamed bodies are compressed
+    chunk by chunk. Bodies from `offload_size` bytes up are compressed in a
+    worker thread, the compressors release the GIL. Compressed bodies of
+    responses carrying an ETag, which are likely to be sent again, are kept in
+    `cache`, and their ETag becomes weak since the bytes differ.
+
+    params:
+        - encoders: encoders in the server's order of preference
+        - minimum_size: smallest body compressed, in bytes
+        - content_types: media types compressed
+        - offload_size: smallest body compressed off the event loop, in bytes
+        - cache: cache of compressed bodies, None disables it
+    """
+
+    def __init__(
+        self,
+        encoders: list[Encoder],
+        minimum_size: int,
+        content_types: list[str],
+        offload_size: int,
+        cache: CompressedCache | None = None,
+    ):
+        self.encoders = encoders
+        self.minimum_size = minimum_size
+        self.content_types = frozenset(content_types)
+        self.offload_size = offload_size
+        self.cache = cache
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def eligible(self, start: Message, headers: MutableHeaders) -> bool:
+        media_type = headers.get("content-type", "").split(";")[0].strip()
+        return (
+            start["status"] not in (204, 206, 304)
+            and media_type in self.content_types
+            and "content-encoding" not in headers
+        )
+
+    async def compress(self, data: bytes, compress) -> bytes:
+        self.bytes_in += len(data)
+        if len(data) >= self.offload_size:
+            compressed = await anyio.to_thread.run_sync(compress, data)
+        else:
+            compressed = compress(data)
+        self.bytes_out += len(compressed)
+        return compressed
+
+    async def compress_body(
+        self, body: bytes, encoder: Encoder, cacheable: bool
+    ) -> bytes:
+        key = None
+        if cacheable and self.cache is not None:
+            key = self.cache.make_key(encoder.name, body)
+            compressed = self.cache.get(key)
+            if compressed is not None:
+                return compressed
+        compressed = await self.compress(body, encoder.compress)
+        if key is not None:
+            self.cache.set(key, compressed)
+        return compressed
+
+    def stats(self) -> dict:
+        return {
+            "encodings": [encoder.name for encoder in self.encoders],
+            "compressed": self.compressed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "cache": self.cache.stats() if self.cache is not None else {},
+        }
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses as the ResponseCompressor decides."""
+
+    def __init__(self, app: ASGIApp, compressor: ResponseCompressor):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.compressor.encoders:
+            await self.app(scope, receive, send)
+            return
+        encoder = negotiate(
+            Headers(scope=scope).get("accept-encoding", ""), self.compressor.encoders
+        )
+        await self.app(scope, receive, _Responder(self.compressor, encoder, send).send)
+
+
+class _Responder:
+    """Send wrapper of one response, holds back the start until the body is seen."""
+
+    def __init__(
+        self, compressor: ResponseCompressor, encoder: Encoder | None, send: Send
+    ):
+        self.compressor = compressor
+        self.encoder = encoder
+        self._send = send
+        self.start: Message | None = None
+        self.stream: StreamCompressor | None = None
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if self.passthrough:
+            await self._send(message)
+        elif message["type"] == "http.response.start":
+            self.start = message
+        elif self.start is None:
+            # extension messages sent before the response, e.g. http.response.debug
+            await self._send(message)
+        elif self.stream is not None:
+            await self._send_chunk(message)
+        elif message["type"] != "http.response.body":
+            self.passthrough = True
+            await self._send(self.start)
+            await self._send(message)
+        else:
+            await self._send_first(message)
+
+    async def _send_first(self, message: Message):
+        headers = MutableHeaders(raw=self.start["headers"])
+        if not self.compressor.eligible(self.start, headers):
+            self.passthrough = True
+            await self._send(self.start)
+            await self._send(message)
+            return
+        headers.add_vary_header("Accept-Encoding")
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None or (
+            not more_body and len(body) < self.compressor.minimum_size
+        ):
+            self.passthrough = True
+            await self._send(self.start)
+            await self._send(message)
+            return
+
+        self.compressor.compressed += 1
+        headers["Content-Encoding"] = self.encoder.name
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if more_body:
+            del headers["Content-Length"]
+            self.stream = self.encoder.stream()
+            await self._send(self.start)
+            await self._send_chunk(message)
+            return
+        body = await self.compressor.compress_body(
+            body, self.encoder, cacheable=etag is not None
+        )
+        headers["Content-Length"] = str(len(body))
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": body})
+
+    async def _send_chunk(self, message: Message):
+        more_body = message.get("more_body", False)
+        stream = self.stream
+
+        def compress(data: bytes) -> bytes:
+            chunk = stream.compress(data)
+            return chunk + (stream.flush() if more_body else stream.finish())
+
+        body = await self.compressor.compress(message.get("body", b""), compress)
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+
+response_compressor = ResponseCompressor(
+    encoders=available_encoders(
+        settings.compression_encodings,
+        {
+            "gzip": settings.compression_gzip_level,
+            "br": settings.compression_brotli_quality,
+            "zstd": settings.compression_zstd_level,
+        },
+    ),
+    minimum_size=settings.compression_minimum_size,
+    content_types=settings.compression_content_types,
+    offload_size=settings.compression_offload_size,
+    cache=CompressedCache(settings.compression_cache_size)
+    if settings.compression_cache_size > 0
+    else None,
+)
@@ -0,0 +1,78 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+
+
+def _utc(value: datetime) -> datetime:
+    # the database stores naive UTC timestamps
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def entity_etag(_id: int, updated: datetime) -> str:
+    """
+    Weak ETag of a row, changes with every write of its `updated` column.
+
+    Weak because CompressionMiddleware sends different bytes per encoding
+    under it, so 200 and 304 responses carry the same tag.
+    """
+    version = int(_utc(updated).timestamp() * 1_000_000)
+    return f'W/"{_id}-{version:x}"'
+
+
+def body_etag(body: bytes) -> str:
+    """Weak ETag of a serialized body, see `entity_etag`."""
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def validators(etag: str, last_modified: datetime | None = None) -> dict[str, str]:
+    """Response headers letting clients revalidate instead of refetching."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            _utc(last_modified).replace(microsecond=0), usegmt=True
+        )
+    return headers
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+) -> bool:
+    """
+    Whether the client's copy is current.
+
+    If-None-Match is compared weakly and, when present, overrides
+    If-Modified-Since, as RFC 9110 requires.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = _utc(parsedate_to_datetime(if_modified_since))
+    except (TypeError, ValueError):
+        return False
+    return _utc(last_modified).replace(microsecond=0) <= since
+
+
+def not_modified_response(headers: dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def conditional_json(request: Request, content: BaseModel) -> Response:
+    """
+    Serializes content with an ETag of its body.
+
+    Answers 304 without the body when the client already has it, the body
+    still has to be built to compute the tag.
+    """
+    body = content.model_dump_json().encode("utf-8")
+    headers = validators(body_etag(body))
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
+    return Response(body, media_type="application/json", headers=headers)
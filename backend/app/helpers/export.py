@@ -0,0 +1,77 @@
+import csv
+import io
+from decimal import Decimal
+from typing import Any, AsyncIterator, Literal, Sequence
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Row
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+async def _ndjson(
+    batches: AsyncIterator[Sequence[Row]], columns: Sequence[str]
+) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield b"".join(
+            orjson.dumps(
+                dict(zip(columns, row)),
+                default=_default,
+                option=orjson.OPT_APPEND_NEWLINE,
+            )
+            for row in batch
+        )
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode("utf-8")
+    return value
+
+
+async def _csv(
+    batches: AsyncIterator[Sequence[Row]], columns: Sequence[str]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows([_csv_value(v) for v in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(
+    batches: AsyncIterator[Sequence[Row]],
+    columns: Sequence[str],
+    export_format: ExportFormat,
+    filename: str,
+) -> StreamingResponse:
+    """
+    Streams row batches as NDJSON or CSV.
+
+    Each batch is serialized and sent as one chunk, so only a single batch
+    is held in memory at a time.
+    """
+    encode = _csv if export_format == "csv" else _ndjson
+    return StreamingResponse(
+        encode(batches, columns),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format}"'
+        },
+    )
@@ -0,0 +1,175 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from core.conf import settings, logger
+from helpers.storage import Storage, KEY_RE, content_key, media_storage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, images are then stored as uploaded
+    Image = ImageOps = None
+
+EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+
+
+def render_thumbnails(
+    path: str, out_base: str, widths: list[int], image_format: str, quality: int
+) -> dict[str, str]:
+    """
+    Writes a thumbnail of the image at path for each width to out_base_<width>.
+
+    Thumbnails keep the aspect ratio and are never larger than the original.
+    Returns {"<width>": "<written path>"}, raises ValueError if the image can't
+    be decoded. Runs in a worker process.
+    """
+    widths = sorted(set(widths), reverse=True)
+    thumbnails = {}
+    try:
+        with Image.open(path) as original:
+            # JPEG decodes straight at a reduced scale, other formats ignore it
+            original.draft(
+                "RGB",
+                (widths[0], max(1, widths[0] * original.height // original.width)),
+            )
+            image = ImageOps.exif_transpose(original)
+            if image_format == "jpeg" and image.mode != "RGB":
+                image = image.convert("RGB")
+            elif image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            # each thumbnail is resized from the previous, larger one
+            for width in widths:
+                if width < image.width:
+                    height = max(1, round(image.height * width / image.width))
+                    image = image.resize(
+                        (width, height), Image.Resampling.LANCZOS, reducing_gap=3.0
+                    )
+                name = f"{out_base}_{width}{EXTENSIONS[image_format]}"
+                image.save(name, format=image_format.upper(), quality=quality)
+                thumbnails[str(width)] = name
+    except (OSError, Image.DecompressionBombError) as e:
+        for name in thumbnails.values():
+            os.remove(name)
+        raise ValueError(f"Cant decode image: {e}") from None
+    return thumbnails
+
+
+class ImageProcessor:
+    """
+    Renders thumbnails of uploaded images in a process pool, off the event loop.
+
+    Thumbnails are stored next to their image under content-addressed keys, so
+    identical uploads share them and render them only once. At most
+    `concurrency` images are submitted to the pool at a time, the rest wait on
+    a semaphore. Without Pillow installed no thumbnails are rendered.
+
+    params:
+        - storage: the media storage
+        - widths: thumbnail widths in pixels
+        - image_format: "webp" or "jpeg"
+        - quality: encoder quality, 1-100
+        - workers: pool size
+        - concurrency: maximum number of images submitted to the pool at once
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        widths: list[int],
+        image_format: str,
+        quality: int,
+        workers: int,
+        concurrency: int,
+    ):
+        self.storage = storage
+        self.widths = list(widths)
+        self.image_format = image_format
+        self.quality = quality
+        self.workers = max(workers, 1)
+        self.concurrency = max(concurrency, 1)
+        self._pool: ProcessPoolExecutor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        if Image is None:
+            logger.warning("Pillow is not installed, thumbnails are disabled")
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and bool(self.widths)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def thumbnails(self, key: str) -> dict[str, str]:
+        """Renders and stores the thumbnails of the image key, {} when disabled."""
+        match = KEY_RE.match(key)
+        if not self.enabled or match is None:
+            return {}
+        extension = EXTENSIONS[self.image_format]
+        keys = {
+            str(width): content_key(match.group(1), f"_{width}{extension}")
+            for width in self.widths
+        }
+        if all([await self.storage.exists(k) for k in keys.values()]):
+            return keys
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            rendered = await loop.run_in_executor(
+                self._get_pool(),
+                render_thumbnails,
+                self.storage.path(key),
+                self.storage.temp_path(),
+                self.widths,
+                self.image_format,
+                self.quality,
+            )
+        except ValueError:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+        for width, path in rendered.items():
+            await self.storage.put(keys[width], path)
+        return keys
+
+    def stats(self) -> dict[str, int | bool | str]:
+        return {
+            "enabled": self.enabled,
+            "format": self.image_format,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+image_processor = ImageProcessor(
+    media_storage,
+    widths=settings.thumbnail_widths,
+    image_format=settings.thumbnail_format,
+    quality=settings.thumbnail_quality,
+    workers=settings.image_workers,
+    concurrency=settings.image_concurrency,
+)
@@ -0,0 +1,237 @@
+import asyncio
+import mimetypes
+import os
+import stat
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Mapping
+
+from fastapi import Response, status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import Receive, Scope, Send
+
+from core.conf import settings
+
+
+class OpenFile:
+    """A cached read-only descriptor, closed once evicted and no longer in use."""
+
+    __slots__ = ("fd", "stat_result", "users", "evicted")
+
+    def __init__(self, fd: int, stat_result: os.stat_result):
+        self.fd = fd
+        self.stat_result = stat_result
+        self.users = 0
+        self.evicted = False
+
+
+class FileDescriptorCache:
+    """
+    LRU cache of open file descriptors and their stat results.
+
+    A hot file is served without resolving its path, opening and stat-ing it
+    on every request. Files are served as they were when opened, which is
+    fine for content-addressed media that never changes; a deleted file is
+    dropped by `forget` or when it falls out of the cache. Descriptors are
+    read with pread, so concurrent responses share one descriptor.
+
+    params:
+        - maxsize: maximum number of open descriptors kept
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._files: OrderedDict[str, OpenFile] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _open(path: str) -> OpenFile:
+        fd = os.open(path, os.O_RDONLY)
+        stat_result = os.fstat(fd)
+        if not stat.S_ISREG(stat_result.st_mode):
+            os.close(fd)
+            raise FileNotFoundError(path)
+        return OpenFile(fd, stat_result)
+
+    async def acquire(self, path: str) -> OpenFile:
+        """Returns the open file at path, FileNotFoundError if there is none."""
+        opened = self._files.get(path)
+        if opened is not None:
+            self.hits += 1
+            self._files.move_to_end(path)
+        else:
+            self.misses += 1
+            opened = await asyncio.to_thread(self._open, path)
+            cached = self._files.get(path)
+            if cached is not None:
+                # opened concurrently by another request
+                os.close(opened.fd)
+                opened = cached
+            elif self.maxsize > 0:
+                self._files[path] = opened
+                while len(self._files) > self.maxsize:
+                    self._evict(self._files.popitem(last=False)[1])
+            else:
+                opened.evicted = True
+        opened.users += 1
+        return opened
+
+    def release(self, opened: OpenFile):
+        opened.users -= 1
+        if opened.evicted and opened.users == 0:
+            os.close(opened.fd)
+
+    @staticmethod
+    def _evict(opened: OpenFile):
+        opened.evicted = True
+        if opened.users == 0:
+            os.close(opened.fd)
+
+    def forget(self, path: str):
+        opened = self._files.pop(path, None)
+        if opened is not None:
+            self._evict(opened)
+
+    def close(self):
+        while self._files:
+            self._evict(self._files.popitem()[1])
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "open_files": len(self._files),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+media_files = FileDescriptorCache(maxsize=settings.media_fd_cache_size)
+
+
+def _parse_range(value: str, size: int) -> tuple[int, int] | None:
+    """
+    Start and exclusive end of a single `bytes=` range of a file of size bytes.
+
+    None means the whole file is sent: several ranges and malformed headers
+    are ignored, as RFC 9110 allows. ValueError if the range is not
+    satisfiable.
+    """
+    units, _, spec = value.partition("=")
+    if units.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last):
+        return None
+    if (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last) + 1, size) if last else size
+    else:
+        # the last `last` bytes
+        if int(last) == 0:
+            raise ValueError("empty suffix range")
+        start, end = max(size - int(last), 0), size
+    if start >= size:
+        raise ValueError("range starts past the end of the file")
+    return start, end
+
+
+class CachedFileResponse(Response):
+    """
+    File response streamed from an OpenFile of FileDescriptorCache.
+
+    Sends the whole file or a single byte range, 416 if the range is not
+    satisfiable; several ranges or a stale If-Range get the whole file. HEAD
+    gets the headers only. Servers supporting the ASGI pathsend extension
+    send whole files by path themselves. The file is released once the
+    response is sent.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        opened: OpenFile,
+        path: str,
+        headers: Mapping[str, str] | None = None,
+        media_type: str | None = None,
+    ):
+        self.opened = opened
+        self.path = path
+        self.status_code = 200
+        self.media_type = (
+            media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        )
+        self.background = None
+        self.init_headers(headers)
+        stat_result = opened.stat_result
+        self.headers.setdefault("accept-ranges", "bytes")
+        self.headers.setdefault("content-length", str(stat_result.st_size))
+        self.headers.setdefault(
+            "last-modified", formatdate(stat_result.st_mtime, usegmt=True)
+        )
+
+    def _range_applies(self, if_range: str | None) -> bool:
+        # If-Range must match the validators exactly, a weak tag never does
+        return if_range is None or if_range in (
+            self.headers.get("etag"),
+            self.headers["last-modified"],
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self._send(scope, receive, send)
+        finally:
+            media_files.release(self.opened)
+
+    async def _send(self, scope: Scope, receive: Receive, send: Send):
+        size = self.opened.stat_result.st_size
+        request_headers = Headers(scope=scope)
+        byte_range = None
+        if "range" in request_headers and self._range_applies(
+            request_headers.get("if-range")
+        ):
+            try:
+                byte_range = _parse_range(request_headers["range"], size)
+            except ValueError:
+                response = Response(
+                    status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+                    headers={"Content-Range": f"bytes */{size}"},
+                )
+                return await response(scope, receive, send)
+
+        headers = MutableHeaders(raw=list(self.raw_headers))
+        status_code, start, end = status.HTTP_200_OK, 0, size
+        if byte_range is not None:
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+            headers["content-length"] = str(end - start)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": headers.raw,
+            }
+        )
+        if scope["method"].upper() == "HEAD" or start == end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if byte_range is None and "http.response.pathsend" in scope.get(
+            "extensions", {}
+        ):
+            await send({"type": "http.response.pathsend", "path": self.path})
+            return
+        while start < end:
+            chunk = await asyncio.to_thread(
+                os.pread, self.opened.fd, min(self.chunk_size, end - start), start
+            )
+            if not chunk:
+                raise RuntimeError(f"File at path {self.path} is shorter than expected")
+            start += len(chunk)
+            await send(
+                {"type": "http.response.body", "body": chunk, "more_body": start < end}
+            )
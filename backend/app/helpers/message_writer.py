@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timezone
+
+from core.conf import settings, logger
+from core.database import async_db_session, commit
+from dao import chat as dao
+
+_STOP = object()
+
+
+class MessageWriter:
+    """
+    Write-behind buffer for chat messages.
+
+    `add` only queues a row, a background task inserts queued rows in
+    batches of up to `batch_size`, at least every `flush_interval` seconds.
+    When `buffer_size` rows are waiting, `add` blocks until the next flush,
+    which slows the senders down instead of growing memory. A batch that
+    fails to insert is retried up to `retries` times, waiting `retry_delay`
+    seconds and twice as long before each next attempt, then its rows are
+    dropped and counted.
+
+    params:
+        - batch_size: maximum rows per INSERT
+        - flush_interval: seconds a row may wait before its batch is written
+        - buffer_size: maximum rows waiting to be written
+        - retries: attempts after the first failed one before a batch is dropped
+        - retry_delay: seconds before the first retry, doubled for each next one
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        buffer_size: int,
+        retries: int = 0,
+        retry_delay: float = 0.1,
+    ):
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.retries = max(retries, 0)
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue[dict] | None = None
+        self._task: asyncio.Task | None = None
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.buffer_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Writes everything still queued and stops the flush task."""
+        if self._task is not None:
+            await self._queue.put(_STOP)
+            await self._task
+            self._task = None
+
+    async def add(self, **values):
+        # the timestamp is taken now, not when the batch reaches the database
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        await self._queue.put({"created": now, "updated": now, **values})
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            rows = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(rows) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                rows.append(item)
+            await self._flush(rows)
+
+    async def _flush(self, rows: list[dict]):
+        if not rows:
+            return
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # senders block on the full queue meanwhile
+                await asyncio.sleep(delay)
+                delay *= 2
+            try:
+                async with async_db_session() as session:
+                    written = await dao.MessageDAO(session).insert_many(rows)
+                    await commit(session)
+                    self.written += written
+                    return
+            except Exception:
+                self.failed += 1
+                logger.exception(
+                    f"Failed to write {len(rows)} chat messages, attempt {attempt + 1}"
+                )
+        self.dropped += len(rows)
+        logger.error(f"Dropped {len(rows)} chat messages")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "buffered": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+message_writer = MessageWriter(
+    batch_size=settings.chat_write_batch_size,
+    flush_interval=settings.chat_write_flush_interval,
+    buffer_size=settings.chat_write_buffer_size,
+    retries=settings.chat_write_retries,
+    retry_delay=settings.chat_write_retry_delay,
+)
@@ -1,5 +1,11 @@
+import base64
+from typing import Any, Sequence
+
+import orjson
 from fastapi import Query
 
+import exceptions
+
 
 class PaginatedParams:
     default_page_number = 1
@@ -8,6 +14,22 @@ class PaginatedParams:
     page_size_ge = 1
 
 
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = orjson.dumps(list(values), default=str)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = orjson.loads(raw)
+    except (ValueError, orjson.JSONDecodeError):
+        raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR
+    if not isinstance(values, list) or not values:
+        raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR
+    return values
+
+
 async def pagination(
     size: int = Query(
         PaginatedParams.default_page_size,
@@ -21,25 +43,70 @@ async def pagination(
         description="Pagination page number",
         alias="page[number]",
     ),
+    after: str | None = Query(
+        None,
+        description="Pagination cursor, returns rows after it",
+        alias="page[after]",
+    ),
+    before: str | None = Query(
+        None,
+        description="Pagination cursor, returns rows before it",
+        alias="page[before]",
+    ),
+    estimate: bool = Query(
+        False,
+        description="Allow an approximate total instead of an exact count",
+        alias="page[estimate]",
+    ),
 ):
-    return {"limit": size, "offset": page}
+    if after is not None and before is not None:
+        raise exceptions.PAGE_EXCEPTION_INVALID_CURSOR
+    return {
+        "limit": size,
+        "offset": page,
+        "after": decode_cursor(after) if after is not None else None,
+        "before": decode_cursor(before) if before is not None else None,
+        "estimate": estimate,
+    }
 
 
 def create_pagination_info(
-    page_size: int, page_number: int, count: int
-) -> dict[str, int | None]:
-    last_page = count // page_size + 1 if count % page_size else count // page_size
-    next_page = page_number + 1 if page_number < last_page else None
-    prev_page = page_number - 1 if (page_number - 1) > 0 else None
+    page_size: int,
+    page_number: int | None,
+    count: int,
+    next_cursor: str | None = None,
+    previous_cursor: str | None = None,
+    approximate: bool = False,
+    has_next: bool | None = None,
+) -> dict[str, int | str | bool | None]:
+    if page_number is None:
+        # cursor mode: page numbers are meaningless, navigation is by cursors only
+        first_page = last_page = next_page = prev_page = None
+    else:
+        first_page = 1
+        if approximate:
+            # an estimated total can not point at the last page
+            last_page = None
+        else:
+            last_page = (
+                count // page_size + 1 if count % page_size else count // page_size
+            )
+        if has_next is None:
+            has_next = last_page is not None and page_number < last_page
+        next_page = page_number + 1 if has_next else None
+        prev_page = page_number - 1 if (page_number - 1) > 0 else None
 
     pagination_info = {
         "total": count,
+        "total_approximate": approximate,
         "page": page_number,
         "size": page_size,
-        "first": 1,
+        "first": first_page,
         "last": last_page,
         "previous": prev_page,
         "next": next_page,
+        "previous_cursor": previous_cursor,
+        "next_cursor": next_cursor,
     }
 
     return pagination_info
@@ -1,4 +1,11 @@
+import asyncio
+import hashlib
+import heapq
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
@@ -49,6 +56,95 @@ def verify_pwd(plain_pwd: str, hashed_pwd: str) -> bool:
     return bcrypt.checkpw(*to_bits(plain_pwd, hashed_pwd))
 
 
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification off the event loop.
+
+    At most `concurrency` jobs are submitted to the pool at a time, the rest
+    wait on a semaphore; their number is reported as the queue depth.
+
+    params:
+        - executor: "thread", "process" or "inline" (run on the loop, no pool)
+        - workers: pool size
+        - concurrency: maximum number of jobs submitted to the pool at once
+    """
+
+    def __init__(self, executor: str, workers: int, concurrency: int):
+        self.executor = executor
+        self.workers = max(workers, 1)
+        self.concurrency = max(concurrency, 1)
+        self._pool: Executor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.executor == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="pwd-hash"
+                )
+        return self._pool
+
+    async def _run(self, func, *args):
+        if self.executor == "inline":
+            self.completed += 1
+            return func(*args)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        waiting = self._semaphore.locked()
+        if waiting:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            if waiting:
+                self.queued -= 1
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    async def hash(self, pwd: str) -> str:
+        return await self._run(hash_pwd, pwd)
+
+    async def verify(self, plain_pwd: str, hashed_pwd: str) -> bool:
+        return await self._run(verify_pwd, plain_pwd, hashed_pwd)
+
+    def stats(self) -> dict[str, int | str]:
+        return {
+            "executor": self.executor,
+            "workers": self.workers,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+pwd_hasher = PasswordHasher(
+    executor=settings.pwd_hash_executor,
+    workers=settings.pwd_hash_workers,
+    concurrency=settings.pwd_hash_concurrency,
+)
+
+
 def encode_token(data):
     return jwt.encode(data, settings.secret_key, settings.algorithm)
 
@@ -84,9 +180,90 @@ def create_user_tokens(
     return schemas.TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
 
+class TokenCache:
+    """
+    Bounded cache of verified access tokens.
+
+    Maps a digest of the raw token to its parsed TokenData until the token's
+    `exp`, so a hot token is decoded and HMAC-verified only once. Revoked
+    tokens are remembered until their `exp` and rejected even if their
+    signature is valid. Both maps are per process and guarded by a lock, sync
+    dependencies use the cache from threadpool threads.
+
+    params:
+        - maxsize: maximum number of verified tokens kept
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, tuple[float, schemas.TokenData]] = (
+            OrderedDict()
+        )
+        self._revoked: dict[bytes, float] = {}
+        # (exp, digest) of revoked tokens, pruned from the earliest exp
+        self._revoked_expiry: list[tuple[float, bytes]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+    def _prune_revoked(self, now: float):
+        while self._revoked_expiry and self._revoked_expiry[0][0] < now:
+            expire, key = heapq.heappop(self._revoked_expiry)
+            if self._revoked.get(key) == expire:
+                del self._revoked[key]
+
+    def get(self, token: str) -> schemas.TokenData | None:
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            self._prune_revoked(now)
+            if key in self._revoked:
+                raise exceptions.CREDENTIALS_EXCEPTION_REVOKED
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expire, user = entry
+            if expire < now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, token: str, user: schemas.TokenData, expire: float):
+        if self.maxsize <= 0:
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (expire, user)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def revoke(self, token: str):
+        try:
+            expire = decode_token(token).get("exp") or time.time()
+        except jwt.PyJWTError:
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._prune_revoked(time.time())
+            self._revoked[key] = expire
+            heapq.heappush(self._revoked_expiry, (expire, key))
+
+
+token_cache = TokenCache(maxsize=settings.token_cache_size)
+
+
 def get_user_token(
     token: Annotated[HTTPAuthorizationCredentials, Depends(oauth2_scheme)],
 ) -> schemas.TokenData:
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
     try:
         payload = decode_token(token)
 
@@ -104,13 +281,16 @@ def get_user_token(
 
     except jwt.PyJWTError:
         raise exceptions.CREDENTIALS_EXCEPTION
+    token_cache.set(token, user, expire)
     return user
 
 
 async def authenticate_user(
-    session: Annotated[AsyncSession, Depends(get_db)], username, password
+    session: Annotated[AsyncSession, Depends(get_db, scope="function")],
+    username,
+    password,
 ):
     user = await dao.UserDAO(session).find_one_or_none(username=username.lower())
-    if not user or not verify_pwd(password, user.hashed_password):
+    if not user or not await pwd_hasher.verify(password, user.hashed_password):
         raise exceptions.AUTH_EXCEPTION_WRONG_PARAMETER
     return user
@@ -1,39 +1,185 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from typing import Any
+
+import orjson
 from fastapi import WebSocket
 
+from core.conf import settings, logger
+from helpers.backplane import Backplane, create_backplane
+from helpers.cache import user_directory
 from schemas import chat as schemas
 
 
+class Connection:
+    """
+    One websocket with its own send queue and writer task.
+
+    Messages are queued as already serialized text, so a slow client only
+    delays itself. When the queue is full the slow consumer policy applies:
+    "drop_oldest" discards the oldest queued message, "disconnect" closes the
+    socket.
+    """
+
+    def __init__(
+        self, websocket: WebSocket, username: str, manager: "ConnectionManager"
+    ):
+        self.websocket = websocket
+        self.username = username
+        self.manager = manager
+        self.queue: asyncio.Queue[str] = asyncio.Queue(
+            maxsize=settings.chat_send_queue_size
+        )
+        self.task = asyncio.create_task(self._write())
+
+    def enqueue(self, text: str) -> bool:
+        """Queues a message, returns False if the slow client must be disconnected."""
+        if self.queue.full():
+            if settings.chat_slow_consumer_policy == "disconnect":
+                return False
+            self.queue.get_nowait()
+            self.manager.dropped += 1
+        self.queue.put_nowait(text)
+        self.manager.max_queue_depth = max(
+            self.manager.max_queue_depth, self.queue.qsize()
+        )
+        return True
+
+    async def _write(self):
+        while True:
+            text = await self.queue.get()
+            start = time.perf_counter()
+            try:
+                await self.websocket.send_text(text)
+            except Exception as e:
+                logger.warning(f"Dropping websocket of {self.username}: {e!r}")
+                # disconnect cancels this task, it must run in another one
+                self.manager.disconnect_later(self.username, self.websocket)
+                return
+            self.manager.send_latencies.append(time.perf_counter() - start)
+            self.manager.sent += 1
+
+    def close(self):
+        self.task.cancel()
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[str, WebSocket] = {}
+    """
+    Websocket connections of this process.
+
+    Messages go through the backplane, so each worker delivers them to the
+    sockets it holds itself, and users connected to other workers receive
+    them too. A message is serialized once per worker and only queued to
+    each connection, its writer task does the actual send.
+    """
+
+    def __init__(self, backplane: Backplane):
+        self.active_connections: dict[str, Connection] = {}
+        self.backplane = backplane
+        self.sent = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.max_queue_depth = 0
+        self.send_latencies: deque[float] = deque(maxlen=1024)
+        # pending disconnects, referenced until done so they are not collected
+        self._disconnects: set[asyncio.Task] = set()
+
+    async def start(self):
+        await self.backplane.start(self._deliver)
 
-    async def connect(self, websocket: WebSocket, username: str):
+    async def stop(self):
+        for connection in self.active_connections.values():
+            connection.close()
+        if self._disconnects:
+            await asyncio.gather(*self._disconnects, return_exceptions=True)
+        await self.backplane.stop()
+
+    async def connect(
+        self, websocket: WebSocket, username: str, user_id: int | None = None
+    ):
         await websocket.accept()
-        self.active_connections.update({username: websocket})
-        print(self.active_connections)
+        if user_id is not None:
+            user_directory.set(username, user_id)
+        replaced = self.active_connections.get(username)
+        self.active_connections[username] = Connection(websocket, username, self)
+        # a reconnect replaces the stored socket, the user joins only once
+        if replaced is None:
+            await self.backplane.join(username)
+        else:
+            replaced.close()
+
+    async def disconnect(self, username: str, websocket: WebSocket | None = None):
+        stored = self.active_connections.get(username)
+        if stored is None or (
+            websocket is not None and stored.websocket is not websocket
+        ):
+            return
+        self.active_connections.pop(username, None)
+        stored.close()
+        await self.backplane.leave(username)
 
-    def disconnect(self, username: str):
-        del self.active_connections[username]
+    def disconnect_later(self, username: str, websocket: WebSocket):
+        task = asyncio.create_task(self.disconnect(username, websocket))
+        self._disconnects.add(task)
+        task.add_done_callback(self._disconnect_done)
+
+    def _disconnect_done(self, task: asyncio.Task):
+        self._disconnects.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Websocket disconnect failed: {task.exception()!r}")
+
+    def online_users(self) -> list[str]:
+        return self.backplane.online_users()
 
     async def send_personal_message(self, message: schemas.SendMessage):
-        if message.receiver == "all":
-            try:
-                await self.active_connections[message.sender].send_json(message.dict())
-            except KeyError:
-                pass
+        await self.backplane.publish({"type": "personal", **message.model_dump()})
+
+    async def broadcast(self, message: schemas.SendMessage):
+        await self.backplane.publish({"type": "broadcast", **message.model_dump()})
+
+    async def _deliver(self, frame: dict[str, Any]):
+        message = {**frame}
+        kind = message.pop("type")
+        if kind == "broadcast":
+            receivers = [u for u in self.active_connections if u != message["sender"]]
+        elif message["receiver"] == "all":
+            receivers = [message["sender"]]
         else:
+            receivers = [message["receiver"], message["sender"]]
+
+        text = orjson.dumps(message).decode("utf-8")
+        slow = []
+        for username in receivers:
+            connection = self.active_connections.get(username)
+            if connection is not None and not connection.enqueue(text):
+                slow.append(connection)
+        if slow:
+            logger.warning(f"Disconnecting {len(slow)} slow websocket(s)")
+        for connection in slow:
+            self.slow_disconnects += 1
+            await self.disconnect(connection.username, connection.websocket)
             try:
-                await self.active_connections[message.receiver].send_json(
-                    message.dict()
-                )
-                await self.active_connections[message.sender].send_json(message.dict())
-            except KeyError:
+                await connection.websocket.close(code=1008)
+            except Exception:
                 pass
 
-    async def broadcast(self, message: schemas.SendMessage):
-        for username, websocket in self.active_connections.items():
-            if username != message.sender:
-                await websocket.send_json(message.dict())
+    def stats(self) -> dict[str, int | float]:
+        latencies = sorted(self.send_latencies)
+        p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+        return {
+            "connections": len(self.active_connections),
+            "queued": sum(c.queue.qsize() for c in self.active_connections.values()),
+            "max_queue_depth": self.max_queue_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "send_latency_p50_ms": round(statistics.median(latencies) * 1000, 3)
+            if latencies
+            else 0.0,
+            "send_latency_p99_ms": round(p99 * 1000, 3),
+        }
 
 
-manager = ConnectionManager()
+manager = ConnectionManager(create_backplane())
@@ -0,0 +1,269 @@
+import asyncio
+import os
+import re
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import AsyncIterator
+
+from core.conf import BASE_DIR, settings, logger
+from core.database import async_db_session
+from dao import item as dao
+from helpers.media import media_files
+
+# "ab/cd/<sha256>.jpg" and its thumbnails "ab/cd/<sha256>_160.webp"
+KEY_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(_\d+)?\.\w+$")
+
+
+def content_key(digest: str, suffix: str) -> str:
+    """Sharded key of content with the given hex digest, suffix includes the dot."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{suffix}"
+
+
+class Storage(ABC):
+    """
+    Media storage addressed by key.
+
+    Keys are relative paths, content-addressed keys come from `content_key`.
+    Uploads are first written to `temp_path()` and then handed to `put`.
+
+    params:
+        - root: directory holding the objects
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.temp_dir = os.path.join(root, ".tmp")
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_saved = 0
+
+    def temp_path(self) -> str:
+        os.makedirs(self.temp_dir, exist_ok=True)
+        return os.path.join(self.temp_dir, uuid.uuid4().hex)
+
+    def path(self, key: str) -> str:
+        """Local file holding the object, ValueError if key is not a safe path."""
+        parts = key.split("/")
+        if not key or any(p in ("", "..") or p.startswith(".") for p in parts):
+            raise ValueError(f"Invalid media key: {key!r}")
+        return os.path.join(self.root, *parts)
+
+    async def put(self, key: str, source: str) -> bool:
+        """
+        Stores the local file source under key, source is consumed.
+
+        If the key already exists the object is kept, its modification time is
+        refreshed and False is returned.
+        """
+        path = self.path(key)
+        size = os.path.getsize(source)
+        if await asyncio.to_thread(self._refresh, path):
+            os.remove(source)
+            self.deduplicated += 1
+            self.bytes_saved += size
+            return False
+        await asyncio.to_thread(self._write, source, path)
+        self.stored += 1
+        return True
+
+    @staticmethod
+    def _refresh(path: str) -> bool:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    @abstractmethod
+    def _write(self, source: str, path: str): ...
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(os.path.isfile, self.path(key))
+
+    async def delete(self, key: str) -> int:
+        """Deletes the object, returns the number of bytes freed."""
+        return await asyncio.to_thread(self._delete, self.path(key))
+
+    @staticmethod
+    def _delete(path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        return size
+
+    async def keys(self) -> AsyncIterator[list[tuple[str, float]]]:
+        """Yields the content-addressed keys with their mtime, a shard at a time."""
+        for top in sorted(await asyncio.to_thread(self._list_dirs, self.root)):
+            for shard in sorted(await asyncio.to_thread(self._list_dirs, top)):
+                batch = await asyncio.to_thread(self._list_shard, shard)
+                if batch:
+                    yield batch
+
+    @staticmethod
+    def _list_dirs(path: str) -> list[str]:
+        try:
+            with os.scandir(path) as entries:
+                return [
+                    e.path
+                    for e in entries
+                    if len(e.name) == 2 and e.is_dir(follow_symlinks=False)
+                ]
+        except FileNotFoundError:
+            return []
+
+    def _list_shard(self, path: str) -> list[tuple[str, float]]:
+        prefix = os.path.relpath(path, self.root).replace(os.sep, "/")
+        batch = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                key = f"{prefix}/{entry.name}"
+                if KEY_RE.match(key) and entry.is_file(follow_symlinks=False):
+                    batch.append((key, entry.stat().st_mtime))
+        return batch
+
+    def stats(self) -> dict[str, int | str]:
+        return {
+            "backend": type(self).__name__,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+class LocalStorage(Storage):
+    """Objects are files under root, a finished upload is renamed into place."""
+
+    def _write(self, source: str, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source, path)
+
+
+class ObjectStoreStorage(Storage):
+    """
+    Local stand-in for an object store.
+
+    Every put copies the whole object into the bucket through a staging file,
+    the way an upload to a remote store would transfer it, so code written
+    against it does not rely on renames into the served directory.
+    """
+
+    def _write(self, source: str, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        staging = f"{self.temp_path()}.upload"
+        try:
+            shutil.copyfile(source, staging)
+            os.replace(staging, path)
+        finally:
+            for leftover in (source, staging):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+
+def create_storage() -> Storage:
+    root = str(BASE_DIR / settings.upload_dir)
+    if settings.media_storage == "object":
+        return ObjectStoreStorage(root)
+    return LocalStorage(root)
+
+
+class MediaCollector:
+    """
+    Background job deleting content-addressed media no item references.
+
+    An original and its thumbnails are deleted together once no Item.image
+    holds the original's key and none of them was written or re-uploaded in
+    the last `grace` seconds, so uploads whose item is not committed yet
+    are kept.
+
+    params:
+        - storage: the media storage
+        - interval: seconds between runs, 0 disables the job
+        - grace: minimum age in seconds of deleted media
+    """
+
+    def __init__(self, storage: Storage, interval: float, grace: float):
+        self.storage = storage
+        self.interval = interval
+        self.grace = grace
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.deleted = 0
+        self.bytes_freed = 0
+        self.last_run_seconds = 0.0
+
+    async def start(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.collect()
+            except Exception:
+                logger.exception("Media garbage collection failed")
+
+    async def collect(self) -> int:
+        """Deletes unreferenced media, returns the number of deleted objects."""
+        start = time.perf_counter()
+        cutoff = time.time() - self.grace
+        deleted = 0
+        async for batch in self.storage.keys():
+            groups: dict[str, list[tuple[str, float]]] = defaultdict(list)
+            originals = {}
+            for key, modified in batch:
+                match = KEY_RE.match(key)
+                groups[match.group(1)].append((key, modified))
+                if match.group(2) is None:
+                    originals[match.group(1)] = key
+            async with async_db_session() as session:
+                # a replica may not have seen the latest references yet
+                session.sync_session.info["primary"] = True
+                references = await dao.ItemsDAO(session).count_image_references(
+                    list(originals.values())
+                )
+            for digest, objects in groups.items():
+                if references.get(originals.get(digest)):
+                    continue
+                if max(modified for _, modified in objects) > cutoff:
+                    continue
+                for key, _ in objects:
+                    media_files.forget(self.storage.path(key))
+                    self.bytes_freed += await self.storage.delete(key)
+                    deleted += 1
+        self.runs += 1
+        self.deleted += deleted
+        self.last_run_seconds = round(time.perf_counter() - start, 3)
+        if deleted:
+            logger.info(f"Deleted {deleted} unreferenced media objects")
+        return deleted
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "runs": self.runs,
+            "deleted": self.deleted,
+            "bytes_freed": self.bytes_freed,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+
+media_storage = create_storage()
+media_collector = MediaCollector(
+    media_storage,
+    interval=settings.media_gc_interval,
+    grace=settings.media_gc_grace,
+)
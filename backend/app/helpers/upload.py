@@ -1,40 +1,94 @@
+import hashlib
 import os
-import uuid
+from typing import Any
 
 import aiofiles
 from fastapi import HTTPException, UploadFile, status
 
-from core.conf import BASE_DIR
+import exceptions
+from core.conf import settings
+from helpers.images import image_processor
+from helpers.storage import Storage, content_key, media_storage
+
+# magic bytes of the accepted image formats, WebP is checked separately
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+)
+
+
+def sniff_image_type(head: bytes) -> tuple[str, str] | None:
+    """Returns the content type and extension of an image from its first bytes."""
+    for signature, content_type, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type, ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    return None
 
 
 async def handle_file_upload(
     file: UploadFile,
-    dir_location: str = "uploads",
+    storage: Storage | None = None,
     supported_types: list = None,
-    invalid_error_msg: str = "Only .jpeg or .png  files allowed",
+    invalid_error_msg: str = "Only .jpeg, .png or .webp files allowed",
+    max_size: int | None = None,
 ) -> str:
-    if supported_types is None:
-        supported_types = ["image/jpeg", "image/jpg", "image/png"]
-
-    _, ext = os.path.splitext(file.filename)
+    """
+    Streams an uploaded image into storage and returns its media key.
 
-    if not ext:
-        ext = ".jpg"
-
-    dir_location = os.path.join(BASE_DIR, dir_location)
+    The type is sniffed from the file's magic bytes, not taken from the client's
+    content type or file name. The key is derived from the SHA-256 of the
+    content, computed while streaming, so an image uploaded again is stored
+    only once. Files over max_size are rejected with 413.
+    """
+    if storage is None:
+        storage = media_storage
+    if supported_types is None:
+        supported_types = ["image/jpeg", "image/png", "image/webp"]
+    if max_size is None:
+        max_size = settings.upload_max_size
 
-    if not os.path.exists(dir_location):
-        os.makedirs(dir_location)
+    # spooled uploads already know their size
+    if file.size is not None and file.size > max_size:
+        raise exceptions.UPLOAD_EXCEPTION_TOO_LARGE
 
-    if file.content_type not in supported_types:
+    content = await file.read(settings.upload_chunk_size)
+    sniffed = sniff_image_type(content)
+    if sniffed is None or sniffed[0] not in supported_types:
         raise HTTPException(
             status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=invalid_error_msg
         )
 
-    file_name = f"{uuid.uuid4().hex}{ext}"
+    digest = hashlib.sha256()
+    temp_path = storage.temp_path()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out_file:
+            while content:
+                size += len(content)
+                if size > max_size:
+                    raise exceptions.UPLOAD_EXCEPTION_TOO_LARGE
+                digest.update(content)
+                await out_file.write(content)
+                content = await file.read(settings.upload_chunk_size)
+        key = content_key(digest.hexdigest(), sniffed[1])
+        await storage.put(key, temp_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return key
+
 
-    async with aiofiles.open(os.path.join(dir_location, file_name), "wb") as out_file:
-        while content := await file.read(1024):  # async read chunk
-            await out_file.write(content)  # async write chunk
+async def handle_image_upload(file: UploadFile) -> dict[str, Any]:
+    """
+    Stores an uploaded image and its thumbnails.
 
-    return file_name
+    Returns the image and thumbnails values of the item. Raises ValueError if
+    the image can't be decoded, the stored image is then left to the media
+    garbage collector.
+    """
+    key = await handle_file_upload(file)
+    return {"image": key, "thumbnails": await image_processor.thumbnails(key) or None}
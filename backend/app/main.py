@@ -5,16 +5,32 @@ import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
-from api.v1 import item, user, auth, chat
+from api.v1 import item, user, auth, chat, media, metrics
 from core.conf import settings, logger
+from helpers.compression import CompressionMiddleware, response_compressor
+from helpers.images import image_processor
+from helpers.media import media_files
+from helpers.message_writer import message_writer
+from helpers.security import pwd_hasher
+from helpers.socket_manager import manager
+from helpers.storage import media_collector
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
     logger.info("Start configuring server...")
+    await manager.start()
+    await message_writer.start()
+    await media_collector.start()
 
     logger.info("Server started and configured successfully")
     yield
+    await manager.stop()
+    await message_writer.stop()
+    await media_collector.stop()
+    pwd_hasher.shutdown()
+    image_processor.shutdown()
+    media_files.close()
     logger.info("Server shut down")
 
 
@@ -29,6 +45,9 @@ def get_app() -> FastAPI:
     app.include_router(user.router, prefix=settings.api_v1_str)
     app.include_router(auth.router, prefix=settings.api_v1_str)
     app.include_router(chat.router, prefix=settings.api_v1_str)
+    app.include_router(metrics.router, prefix=settings.api_v1_str)
+    app.include_router(media.router)
+    app.add_middleware(CompressionMiddleware, compressor=response_compressor)
 
     return app
 
@@ -40,4 +59,5 @@ if __name__ == "__main__":
         "main:app",
         port=settings.port,
         reload=settings.reload,
+        ws_per_message_deflate=settings.ws_per_message_deflate,
     )
@@ -0,0 +1,38 @@
+"""message history indexes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # tables may already exist with these indexes when created by create_tables
+    op.create_index(
+        "ix_message_receiver_id_id",
+        "message",
+        ["receiver_id", "id"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_message_sender_id_id",
+        "message",
+        ["sender_id", "id"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_message_sender_id_id", table_name="message", if_exists=True)
+    op.drop_index("ix_message_receiver_id_id", table_name="message", if_exists=True)
@@ -0,0 +1,30 @@
+"""item thumbnails
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # tables may already have the column when created by create_tables
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("item")}
+    if "thumbnails" not in columns:
+        op.add_column("item", sa.Column("thumbnails", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("item") as batch_op:
+        batch_op.drop_column("thumbnails")
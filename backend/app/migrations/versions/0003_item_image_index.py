@@ -0,0 +1,25 @@
+"""item image index
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_item_image", "item", ["image"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_item_image", table_name="item", if_exists=True)
@@ -0,0 +1,71 @@
+"""item search
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_item_price_id", "item", ["price", "id"], if_not_exists=True)
+    op.create_index("ix_item_name_id", "item", ["name", "id"], if_not_exists=True)
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5(
+            name, description, content='item', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS item_fts_ai AFTER INSERT ON item BEGIN
+            INSERT INTO item_fts(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS item_fts_ad AFTER DELETE ON item BEGIN
+            INSERT INTO item_fts(item_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS item_fts_au AFTER UPDATE OF name, description
+        ON item BEGIN
+            INSERT INTO item_fts(item_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO item_fts(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+        """
+    )
+    # index the rows that existed before the triggers
+    op.execute("INSERT INTO item_fts(item_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS item_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS item_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS item_fts_ai")
+        op.execute("DROP TABLE IF EXISTS item_fts")
+    op.drop_index("ix_item_name_id", table_name="item", if_exists=True)
+    op.drop_index("ix_item_price_id", table_name="item", if_exists=True)
@@ -1,10 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
 from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import Mapped, mapped_column, declared_attr, DeclarativeBase
 
 
+def utc_now() -> datetime:
+    """Naive UTC time like CURRENT_TIMESTAMP, but with microseconds."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class MappedBase(AsyncAttrs, DeclarativeBase):
     """
     Declarative base class, the original DeclarativeBase class,
@@ -21,7 +26,10 @@ class MappedBase(AsyncAttrs, DeclarativeBase):
         doc="Time of creation", server_default=func.now()
     )
     updated: Mapped[datetime] = mapped_column(
-        doc="Time of last modification", server_default=func.now(), onupdate=func.now()
+        doc="Time of last modification",
+        server_default=func.now(),
+        # microseconds keep two writes within one second apart, ETags rely on it
+        onupdate=utc_now,
     )
 
     @declared_attr
@@ -1,10 +1,16 @@
-from sqlalchemy import String, Integer, ForeignKey
+from sqlalchemy import String, Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import MappedBase
 
 
 class Message(MappedBase):
+    __table_args__ = (
+        # chat history seeks: public / incoming messages and outgoing messages by id
+        Index("ix_message_receiver_id_id", "receiver_id", "id"),
+        Index("ix_message_sender_id_id", "sender_id", "id"),
+    )
+
     text: Mapped[str] = mapped_column(String(255), nullable=True)
 
     sender_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id"))
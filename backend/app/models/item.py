@@ -1,11 +1,57 @@
-from sqlalchemy import Float, String
+from sqlalchemy import DDL, JSON, Float, Index, String, event
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import MappedBase
 
 
 class Item(MappedBase):
+    __table_args__ = (
+        # search filters and sorts, id breaks ties for stable pages
+        Index("ix_item_price_id", "price", "id"),
+        Index("ix_item_name_id", "name", "id"),
+    )
+
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(String, nullable=True)
     price: Mapped[float] = mapped_column(Float(asdecimal=True), nullable=True)
-    image: Mapped[str] = mapped_column(String(255), nullable=True)
+    # media key of the image, indexed for the media garbage collector
+    image: Mapped[str] = mapped_column(String(255), nullable=True, index=True)
+    # thumbnail media keys by width, {"160": "<image key>_160.webp", ...}
+    thumbnails: Mapped[dict[str, str]] = mapped_column(JSON, nullable=True)
+
+
+# SQLite FTS5 index of name and description, kept in sync by triggers;
+# migration 0004 creates the same objects in existing databases
+ITEM_FTS_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5(
+        name, description, content='item', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_fts_ai AFTER INSERT ON item BEGIN
+        INSERT INTO item_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_fts_ad AFTER DELETE ON item BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_fts_au AFTER UPDATE OF name, description ON item
+    BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO item_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+)
+for statement in ITEM_FTS_DDL:
+    event.listen(
+        Item.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
@@ -7,12 +7,15 @@ from typing_extensions import Annotated
 
 class PageInfo(BaseModel):
     total: int | None
+    total_approximate: bool = False
     page: int | None
     size: int | None
     first: int | None
     last: int | None
     previous: int | None
     next: int | None
+    previous_cursor: str | None = None
+    next_cursor: str | None = None
 
 
 class Page(BaseModel):
@@ -24,6 +27,16 @@ class IdResponse(BaseModel):
     id: int
 
 
+class BulkError(BaseModel):
+    index: int
+    detail: str | list
+
+
+class BulkResponse(BaseModel):
+    ids: list[int]
+    errors: list[BulkError]
+
+
 class JSONResponse(ORJSONResponse):
     pass
 
@@ -1,5 +1,10 @@
+from datetime import datetime
+from typing import Literal
+
 from pydantic import BaseModel
 
+MESSAGE_HISTORY_VERSION = 1
+
 
 class ReceiveMessage(BaseModel):
     receiver: int | str | None = None
@@ -8,3 +13,20 @@ class ReceiveMessage(BaseModel):
 
 class SendMessage(ReceiveMessage):
     sender: str
+
+
+class MessageResponse(BaseModel):
+    id: int
+    text: str | None = None
+    created: datetime
+    sender: str
+    receiver: str | None = None
+
+
+class MessageHistoryResponse(BaseModel):
+    """Chat history page, bump version on any incompatible change of the shape."""
+
+    version: Literal[1] = MESSAGE_HISTORY_VERSION
+    messages_list: list[MessageResponse]
+    before: str | None = None
+    after: str | None = None
@@ -1,13 +1,23 @@
-from pydantic import BaseModel, Field
+from typing import Literal
 
+from pydantic import BaseModel, Field, computed_field
+
+from core.conf import settings
 from schemas.base import IdResponse
 
 
+def media_url(file_name: str) -> str:
+    return f"{settings.media_url}/{file_name}"
+
+
 class Item(BaseModel):
     description: str | None = None
     price: float | None = Field(None, description="Price for the item")
 
 
+ItemSearchSort = Literal["rank", "price", "-price", "name", "newest"]
+
+
 class ItemRequest(Item):
     name: str
 
@@ -16,8 +26,29 @@ class ItemUpdateRequest(Item):
     name: str | None = None
 
 
+class ItemBulkCreateRequest(ItemRequest):
+    id: int | None = Field(None, description="Existing id, only used by upsert")
+
+
+class ItemBulkUpdateRequest(ItemUpdateRequest):
+    id: int
+
+
 class ItemImageResponse(BaseModel):
     image: str | None = None
+    thumbnails: dict[str, str] | None = None
+
+    @computed_field
+    @property
+    def image_url(self) -> str | None:
+        return media_url(self.image) if self.image else None
+
+    @computed_field
+    @property
+    def thumbnail_urls(self) -> dict[str, str]:
+        return {
+            width: media_url(name) for width, name in (self.thumbnails or {}).items()
+        }
 
 
 class ItemResponse(ItemRequest, ItemImageResponse, IdResponse): ...
@@ -0,0 +1 @@
+"""Benchmarks of the app, see `python -m benchmarks --help`."""
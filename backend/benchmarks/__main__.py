@@ -0,0 +1,243 @@
+"""
+Benchmark suite of the API and the chat websocket.
+
+Seeds a scratch SQLite database, runs the HTTP scenarios through the
+in-process ASGI driver and/or uvicorn over real sockets, runs the websocket
+fan-out over sockets, and writes the results as JSON. With --baseline the
+results are compared with a stored run and the exit status is 1 if any
+metric regressed by more than --tolerance.
+
+    cd backend
+    python -m benchmarks seed --db /tmp/bench.db --items 100000
+    python -m benchmarks run --db /tmp/bench.db --output results.json
+    python -m benchmarks run --output results.json --baseline baseline.json
+    python -m benchmarks run --scenarios login_probe --pwd-hash-executor inline
+    python -m benchmarks compare results.json baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from importlib import metadata
+from pathlib import Path
+
+from benchmarks import scenarios
+from benchmarks.drivers import ASGIDriver, Driver, SocketDriver, app_env
+from benchmarks.report import compare
+from benchmarks.seed import seed
+
+PACKAGES = ("fastapi", "starlette", "sqlalchemy", "pydantic", "uvicorn", "aiosqlite")
+
+
+def environment() -> dict:
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": versions,
+    }
+
+
+async def run_driver(driver: Driver, args, seeded: dict) -> dict:
+    results = {}
+    async with driver:
+        for name in args.scenarios:
+            if name == "login_probe":
+                results[name] = await scenarios.run_login_probe(
+                    driver,
+                    seeded,
+                    args.concurrency,
+                    args.duration,
+                    args.warmup,
+                    args.probe_path,
+                    args.probe_interval,
+                    args.random_seed,
+                )
+            elif name == "ws_fanout":
+                if not driver.websockets:
+                    continue
+                results[name] = await scenarios.run_ws_fanout(
+                    driver, args.ws_clients, args.ws_messages, args.ws_rate
+                )
+            else:
+                results[name] = await scenarios.run_http(
+                    driver,
+                    scenarios.HTTP_SCENARIOS[name],
+                    seeded,
+                    args.concurrency,
+                    args.duration,
+                    args.warmup,
+                    args.random_seed,
+                )
+            print(f"{driver.name} {name}: {results[name]}", file=sys.stderr)
+    return results
+
+
+def run(args) -> int:
+    # the in-process driver changes into the app directory
+    output = Path(args.output).resolve() if args.output else None
+    baseline = str(Path(args.baseline).resolve()) if args.baseline else None
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        if args.db:
+            # work on a copy, the scenarios write to the database
+            shutil.copyfile(args.db, db_path)
+            seeded = json.loads(Path(f"{args.db}.json").read_text())
+        else:
+            seeded = seed(
+                db_path, args.users, args.items, args.messages, args.random_seed
+            )
+        if "ws_fanout" in args.scenarios and args.ws_clients > seeded["users"]:
+            sys.exit("--ws-clients can't exceed the number of seeded users")
+        env = app_env(db_path)
+        if args.pwd_hash_executor:
+            env["PWD_HASH_EXECUTOR"] = args.pwd_hash_executor
+        os.environ.update(env)
+
+        results = {}
+        for name in args.drivers:
+            if name == "asgi":
+                driver = ASGIDriver()
+            else:
+                driver = SocketDriver(env, port=args.port)
+            results[name] = asyncio.run(run_driver(driver, args, seeded))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "seeded": seeded,
+        "settings": {
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "concurrency": args.concurrency,
+            "pwd_hash_executor": args.pwd_hash_executor,
+        },
+        "results": results,
+    }
+    if output is not None:
+        output.write_text(json.dumps(report, indent=2) + "\n")
+    else:
+        print(json.dumps(report, indent=2))
+    if baseline:
+        return check(report, baseline, args.tolerance, args.min_delta_ms)
+    return 0
+
+
+def check(
+    results: dict, baseline_path: str, tolerance: float, min_delta_ms: float
+) -> int:
+    baseline = json.loads(Path(baseline_path).read_text())
+    for key in ("settings", "seeded"):
+        before, after = baseline.get(key, {}), results.get(key, {})
+        if {k: v for k, v in before.items() if k != "seconds"} != {
+            k: v for k, v in after.items() if k != "seconds"
+        }:
+            print(f"WARNING {key} differ from the baseline's", file=sys.stderr)
+    regressions = compare(results, baseline, tolerance, min_delta_ms)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions against {baseline_path}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=10000)
+
+
+def add_compare_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed relative regression, 0.2 is 20%%",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=1.0,
+        help="latency growth below this is never a regression",
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description=__doc__.split("\n\n")[0]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="create a seeded database")
+    seed_parser.add_argument("--db", required=True)
+    add_seed_arguments(seed_parser)
+    seed_parser.add_argument("--random-seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "--db", help="database made by `seed`, a scratch one is seeded if omitted"
+    )
+    add_seed_arguments(run_parser)
+    run_parser.add_argument(
+        "--drivers", nargs="+", default=["asgi", "socket"], choices=["asgi", "socket"]
+    )
+    run_parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=[*scenarios.HTTP_SCENARIOS, "login_probe", "ws_fanout"],
+        choices=[*scenarios.HTTP_SCENARIOS, "login_probe", "ws_fanout"],
+    )
+    run_parser.add_argument("--duration", type=float, default=10.0)
+    run_parser.add_argument("--warmup", type=float, default=2.0)
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument(
+        "--pwd-hash-executor",
+        choices=["thread", "process", "inline"],
+        help="password hashing executor of the app, its default if omitted",
+    )
+    run_parser.add_argument("--probe-path", default="/chat/all_users")
+    run_parser.add_argument("--probe-interval", type=float, default=0.01)
+    run_parser.add_argument("--ws-clients", type=int, default=100)
+    run_parser.add_argument("--ws-messages", type=int, default=200)
+    run_parser.add_argument(
+        "--ws-rate", type=float, default=0, help="messages per second, 0 is unlimited"
+    )
+    run_parser.add_argument("--random-seed", type=int, default=0)
+    run_parser.add_argument("--port", type=int, default=8765)
+    run_parser.add_argument("--output", help="result file, stdout if omitted")
+    run_parser.add_argument("--baseline", help="result file to compare with")
+    add_compare_arguments(run_parser)
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("baseline")
+    add_compare_arguments(compare_parser)
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        if os.path.exists(args.db):
+            sys.exit(f"{args.db} already exists")
+        seeded = seed(args.db, args.users, args.items, args.messages, args.random_seed)
+        Path(f"{args.db}.json").write_text(json.dumps(seeded) + "\n")
+        print(json.dumps(seeded, indent=2))
+        return 0
+    if args.command == "run":
+        return run(args)
+    results = json.loads(Path(args.results).read_text())
+    return check(results, args.baseline, args.tolerance, args.min_delta_ms)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Transports the scenarios send their requests through.
+
+`ASGIDriver` calls the app in this process through httpx's ASGITransport, so
+it measures the framework and the app without any network or server cost.
+`SocketDriver` starts uvicorn in a subprocess and talks to it over TCP with
+aiohttp, which is what clients see; only it supports websockets.
+
+The app reads its settings from the environment, see `app_env`.
+"""
+
+import asyncio
+import importlib
+import os
+import subprocess
+import sys
+import time
+from abc import ABC, abstractmethod
+from contextlib import AsyncExitStack
+from typing import Any
+
+import aiohttp
+import httpx
+
+from benchmarks.seed import APP_DIR
+
+
+def app_env(db_path: str) -> dict[str, str]:
+    """Environment of the app under test, backed by the database at db_path."""
+    return {
+        "SECRET_KEY": os.environ.get("SECRET_KEY") or os.urandom(32).hex(),
+        "SQLALCHEMY_DATABASE_URI": f"sqlite+aiosqlite:///{db_path}",
+        "DB_ECHO": "false",
+        "MEDIA_GC_INTERVAL": "0",
+    }
+
+
+def import_app_module(name: str):
+    """
+    Imports a module of the app, e.g. "main", into this process.
+
+    Settings are read on first import, the environment must be set up by then.
+    """
+    # the app resolves its templates and uploads relative to its directory
+    os.chdir(APP_DIR)
+    if str(APP_DIR) not in sys.path:
+        sys.path.insert(0, str(APP_DIR))
+    return importlib.import_module(name)
+
+
+class Driver(ABC):
+    """Sends requests to the app, used as an async context manager."""
+
+    name: str
+    websockets = False
+
+    def __init__(self, api_prefix: str = "/api/v1"):
+        self.api_prefix = api_prefix
+
+    async def __aenter__(self) -> "Driver":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    @abstractmethod
+    async def request(self, method: str, path: str, **kwargs: Any) -> tuple[int, bytes]:
+        """Sends a request to path under the API prefix, returns status and body."""
+
+    def websocket(self, path: str, **params: str):
+        """Async context manager of a websocket connected to path."""
+        raise NotImplementedError(f"{self.name} driver does not support websockets")
+
+
+class ASGIDriver(Driver):
+    """
+    Calls the app in process, running its lifespan around the benchmark.
+
+    The app is imported on enter, see `import_app_module`.
+    """
+
+    name = "asgi"
+
+    def __init__(self, api_prefix: str = "/api/v1"):
+        super().__init__(api_prefix)
+        self._stack = AsyncExitStack()
+        self._client: httpx.AsyncClient | None = None
+
+    async def __aenter__(self) -> "ASGIDriver":
+        app = import_app_module("main").app
+        await self._stack.enter_async_context(app.router.lifespan_context(app))
+        self._client = await self._stack.enter_async_context(
+            httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app),
+                base_url=f"http://bench{self.api_prefix}",
+            )
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._stack.aclose()
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> tuple[int, bytes]:
+        response = await self._client.request(method, path.lstrip("/"), **kwargs)
+        return response.status_code, response.content
+
+
+class SocketDriver(Driver):
+    """
+    Starts uvicorn on port and sends requests over real sockets.
+
+    params:
+        - env: environment of the server, see `app_env`
+        - port: port uvicorn listens on
+    """
+
+    name = "socket"
+    websockets = True
+
+    def __init__(
+        self,
+        env: dict[str, str],
+        port: int = 8765,
+        api_prefix: str = "/api/v1",
+    ):
+        super().__init__(api_prefix)
+        self.env = env
+        self.port = port
+        self.base = f"http://127.0.0.1:{port}{api_prefix}"
+        self._server: subprocess.Popen | None = None
+        self._session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self) -> "SocketDriver":
+        self._server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "main:app",
+                "--port",
+                str(self.port),
+                "--log-level",
+                "warning",
+                "--no-access-log",
+            ],
+            cwd=APP_DIR,
+            env={**os.environ, **self.env},
+        )
+        # websockets hold their connection, concurrency is bounded by the callers
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        try:
+            await self._wait_ready()
+        except BaseException:
+            await self.__aexit__(None, None, None)
+            raise
+        return self
+
+    async def _wait_ready(self, timeout: float = 30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._server.poll() is not None:
+                raise RuntimeError("server exited on startup")
+            try:
+                async with self._session.get(f"{self.base}/chat/all_users") as resp:
+                    if resp.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError("server did not start")
+
+    async def __aexit__(self, *exc_info):
+        if self._session is not None:
+            await self._session.close()
+        if self._server is not None:
+            self._server.terminate()
+            self._server.wait()
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> tuple[int, bytes]:
+        async with self._session.request(
+            method, f"{self.base}{path}", **kwargs
+        ) as resp:
+            return resp.status, await resp.read()
+
+    def websocket(self, path: str, **params: str):
+        return self._session.ws_connect(
+            f"{self.base}{path}", params=params, autoping=True
+        )
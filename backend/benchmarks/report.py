@@ -0,0 +1,66 @@
+"""
+Summaries of measured latencies and comparison of results with a baseline.
+
+A result file maps driver names to scenario names to metrics. Metrics ending
+in `_per_s` are throughputs, higher is better; metrics ending in `_ms` are
+latencies, lower is better; `errors` and metrics ending in `_errors` must
+not grow.
+"""
+
+import statistics
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict:
+    """Throughput and latency percentiles of requests that took `seconds`."""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else 0.0,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def compare(
+    results: dict, baseline: dict, tolerance: float, min_delta_ms: float = 1.0
+) -> list[str]:
+    """
+    Returns a line for every metric that regressed against the baseline.
+
+    A throughput regresses when it drops by more than `tolerance` (0.2 is
+    20%), a latency when it grows by more than `tolerance` and by more than
+    `min_delta_ms`, so sub-millisecond jitter is not reported. Scenarios
+    missing from either file are skipped.
+    """
+    regressions = []
+    for driver, scenarios in baseline.get("results", {}).items():
+        for scenario, before in scenarios.items():
+            after = results.get("results", {}).get(driver, {}).get(scenario)
+            if after is None:
+                continue
+            for metric, old in before.items():
+                new = after.get(metric)
+                if not isinstance(old, (int, float)) or new is None:
+                    continue
+                name = f"{driver}.{scenario}.{metric}"
+                if metric.endswith("_per_s"):
+                    regressed = new < old * (1 - tolerance)
+                elif metric.endswith("_ms"):
+                    regressed = new > old * (1 + tolerance) and (
+                        new - old > min_delta_ms
+                    )
+                elif metric == "errors" or metric.endswith("_errors"):
+                    regressed = new > old
+                else:
+                    continue
+                if regressed:
+                    regressions.append(f"{name}: {old} -> {new}")
+    return regressions
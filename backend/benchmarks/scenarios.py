@@ -0,0 +1,264 @@
+"""
+Benchmark scenarios.
+
+HTTP scenarios run `concurrency` closed loops, each sending its next request
+as soon as the previous one is answered, first for a warmup period that is
+not measured and then for `duration` seconds. Responses with a status of 400
+or above and failed requests count as errors.
+
+The login probe measures an unrelated endpoint while `concurrency` loops
+keep /auth/login busy, which shows whether password hashing blocks the
+event loop; run it with each --pwd-hash-executor to compare them.
+
+The websocket fan-out connects `clients` users to /chat/ws; one of them
+broadcasts `messages` messages and every other client measures the time
+from send to receipt of each message.
+"""
+
+import asyncio
+import json
+import random
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Callable
+
+from benchmarks.drivers import Driver, import_app_module
+from benchmarks.report import percentile, summarize
+from benchmarks.seed import PASSWORD, WORDS, username
+
+# builds the (method, path, request kwargs) of the next request
+RequestFactory = Callable[[random.Random, dict], tuple[str, str, dict[str, Any]]]
+PAGE_SIZE = 20
+
+
+def items_list(rnd: random.Random, seeded: dict) -> tuple[str, str, dict]:
+    pages = max(1, min(50, seeded["items"] // PAGE_SIZE))
+    params = {"page[size]": PAGE_SIZE, "page[number]": rnd.randint(1, pages)}
+    return "GET", "/items/", {"params": params}
+
+
+def item_by_id(rnd: random.Random, seeded: dict) -> tuple[str, str, dict]:
+    return "GET", f"/items/{rnd.randint(1, seeded['items'])}", {}
+
+
+def items_search(rnd: random.Random, seeded: dict) -> tuple[str, str, dict]:
+    params = {"q": rnd.choice(WORDS), "page[size]": PAGE_SIZE}
+    return "GET", "/items/search", {"params": params}
+
+
+def login(rnd: random.Random, seeded: dict) -> tuple[str, str, dict]:
+    data = {"username": username(rnd.randint(1, seeded["users"])), "password": PASSWORD}
+    return "POST", "/auth/login", {"data": data}
+
+
+HTTP_SCENARIOS: dict[str, RequestFactory] = {
+    "items_list": items_list,
+    "item_by_id": item_by_id,
+    "items_search": items_search,
+    "login": login,
+}
+
+
+async def _http_loops(
+    driver: Driver,
+    factory: RequestFactory,
+    seeded: dict,
+    concurrency: int,
+    seconds: float,
+    rnd: random.Random,
+) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def loop():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            method, path, kwargs = factory(rnd, seeded)
+            start = time.perf_counter()
+            try:
+                status, _ = await driver.request(method, path, **kwargs)
+            except Exception:
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def run_http(
+    driver: Driver,
+    factory: RequestFactory,
+    seeded: dict,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    random_seed: int = 0,
+) -> dict:
+    """Throughput and latency percentiles of one HTTP scenario."""
+    rnd = random.Random(random_seed)
+    if warmup > 0:
+        await _http_loops(driver, factory, seeded, concurrency, warmup, rnd)
+    start = time.perf_counter()
+    latencies, errors = await _http_loops(
+        driver, factory, seeded, concurrency, duration, rnd
+    )
+    return {
+        "concurrency": concurrency,
+        **summarize(latencies, errors, time.perf_counter() - start),
+    }
+
+
+async def _probe_loop(
+    driver: Driver, path: str, interval: float, seconds: float
+) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            status, _ = await driver.request("GET", path)
+        except Exception:
+            status = 599
+        if status >= 400:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return latencies, errors
+
+
+async def run_login_probe(
+    driver: Driver,
+    seeded: dict,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    probe_path: str = "/chat/all_users",
+    probe_interval: float = 0.01,
+    random_seed: int = 0,
+) -> dict:
+    """Login throughput and probe latency percentiles while logins run."""
+    rnd = random.Random(random_seed)
+    if warmup > 0:
+        await _http_loops(driver, login, seeded, concurrency, warmup, rnd)
+    start = time.perf_counter()
+    (logins, login_errors), (probes, probe_errors) = await asyncio.gather(
+        _http_loops(driver, login, seeded, concurrency, duration, rnd),
+        _probe_loop(driver, probe_path, probe_interval, duration),
+    )
+    seconds = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "probe_path": probe_path,
+        **{
+            f"login_{k}": v for k, v in summarize(logins, login_errors, seconds).items()
+        },
+        **{
+            f"probe_{k}": v for k, v in summarize(probes, probe_errors, seconds).items()
+        },
+    }
+
+
+def access_tokens(user_ids: range) -> list[str]:
+    """Access tokens of seeded users, signed with the app's secret key."""
+    security = import_app_module("helpers.security")
+    schemas = import_app_module("schemas.user")
+    return [
+        security.create_user_tokens(
+            schemas.TokenData(id=user_id, username=username(user_id), is_active=True)
+        ).access_token
+        for user_id in user_ids
+    ]
+
+
+async def _wait_online(driver: Driver, count: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, body = await driver.request("GET", "/chat/all_users")
+        if status == 200 and len(json.loads(body)["users_list"]) >= count:
+            return
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"{count} websocket clients did not come online")
+
+
+async def run_ws_fanout(
+    driver: Driver,
+    clients: int,
+    messages: int,
+    rate: float,
+    timeout: float = 60,
+) -> dict:
+    """
+    Delivery throughput and latency of broadcasts to clients - 1 receivers.
+
+    The sender sends as fast as it can when rate is 0, otherwise rate
+    messages per second. Messages not received within timeout seconds after
+    the last send count as errors.
+    """
+    tokens = access_tokens(range(1, clients + 1))
+    sender = username(1)
+    latencies: list[float] = []
+    expected = messages * (clients - 1)
+    done = asyncio.Event()
+    last_receipt = 0.0
+
+    async def receive(ws, is_sender: bool):
+        nonlocal last_receipt
+        async for frame in ws:
+            if is_sender:
+                continue  # own echoes
+            data = json.loads(frame.data)
+            if data.get("sender") != sender or not data["text"].startswith("bench "):
+                continue
+            last_receipt = time.perf_counter()
+            latencies.append(last_receipt - float(data["text"].split()[2]))
+            if len(latencies) >= expected:
+                done.set()
+
+    async with AsyncExitStack() as stack:
+        sockets = [
+            await stack.enter_async_context(driver.websocket("/chat/ws", token=token))
+            for token in tokens
+        ]
+        readers = [
+            asyncio.create_task(receive(ws, i == 0)) for i, ws in enumerate(sockets)
+        ]
+        try:
+            await _wait_online(driver, clients, timeout)
+            start = time.perf_counter()
+            for seq in range(messages):
+                await sockets[0].send_json(
+                    {
+                        "receiver": "all",
+                        "text": f"bench {seq} {time.perf_counter():.6f}",
+                    }
+                )
+                if rate > 0:
+                    await asyncio.sleep(1 / rate)
+            if expected:
+                try:
+                    await asyncio.wait_for(done.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for reader in readers:
+                reader.cancel()
+            await asyncio.gather(*readers, return_exceptions=True)
+
+    seconds = max(last_receipt - start, 1e-9) if latencies else 0.0
+    return {
+        "clients": clients,
+        "messages": messages,
+        "deliveries": len(latencies),
+        "errors": expected - len(latencies),
+        "deliveries_per_s": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
@@ -0,0 +1,132 @@
+"""
+Bulk seeding of a scratch SQLite database for the benchmarks.
+
+The schema is created by the app itself, rows are then written with plain
+sqlite3 `executemany` in one transaction. The FTS insert trigger of `item` is
+dropped while items are inserted and the index is rebuilt once afterwards,
+which is much faster than maintaining it row by row.
+
+Every user gets the password `PASSWORD`, hashed once, and the username
+`user<id>`, so ids 1..users are known to the scenarios.
+"""
+
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+import bcrypt
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+PASSWORD = "Bench_pwd1"
+WORDS = (
+    "red green blue black white small large light heavy smart classic "
+    "wooden steel cotton leather glass lamp chair table desk shelf phone "
+    "watch bottle bag jacket shirt boots kettle mug pillow blanket mirror"
+).split()
+
+
+def username(user_id: int) -> str:
+    return f"user{user_id}"
+
+
+def create_schema(db_path: str):
+    env = {
+        # the app refuses to start without a key, the schema does not need one
+        "SECRET_KEY": os.urandom(32).hex(),
+        **os.environ,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite+aiosqlite:///{db_path}",
+    }
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import asyncio; import models.user, models.item, models.chat; "
+            "from core.database import create_tables; asyncio.run(create_tables())",
+        ],
+        cwd=APP_DIR,
+        env=env,
+        check=True,
+    )
+
+
+def _users(count: int, hashed: str) -> Iterator[tuple]:
+    for user_id in range(1, count + 1):
+        name = username(user_id)
+        yield user_id, name, hashed, f"User {user_id}", f"{name}@example.com", 1
+
+
+def _items(count: int, rnd: random.Random) -> Iterator[tuple]:
+    for item_id in range(1, count + 1):
+        name = " ".join(rnd.choices(WORDS, k=2))
+        description = " ".join(rnd.choices(WORDS, k=rnd.randint(4, 12)))
+        yield item_id, name, description, round(rnd.uniform(1, 1000), 2)
+
+
+def _messages(count: int, users: int, rnd: random.Random) -> Iterator[tuple]:
+    for _ in range(count):
+        # a quarter of the messages are private
+        receiver = rnd.randint(1, users) if rnd.random() < 0.25 else None
+        text = " ".join(rnd.choices(WORDS, k=rnd.randint(2, 10)))
+        yield text, rnd.randint(1, users), receiver
+
+
+def seed(
+    db_path: str,
+    users: int,
+    items: int,
+    messages: int,
+    random_seed: int = 0,
+    bcrypt_rounds: int = 12,
+) -> dict:
+    """Creates a database at db_path with the given number of rows."""
+    start = time.perf_counter()
+    db_path = os.path.abspath(db_path)
+    create_schema(db_path)
+    rnd = random.Random(random_seed)
+    hashed = bcrypt.hashpw(
+        PASSWORD.encode(), bcrypt.gensalt(rounds=bcrypt_rounds)
+    ).decode()
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO user (id, username, hashed_password, fullname, email,"
+            " is_active) VALUES (?, ?, ?, ?, ?, ?)",
+            _users(users, hashed),
+        )
+        (trigger,) = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger'"
+            " AND name = 'item_fts_ai'"
+        ).fetchone() or (None,)
+        if trigger is not None:
+            conn.execute("DROP TRIGGER item_fts_ai")
+        conn.executemany(
+            "INSERT INTO item (id, name, description, price) VALUES (?, ?, ?, ?)",
+            _items(items, rnd),
+        )
+        if trigger is not None:
+            conn.execute("INSERT INTO item_fts(item_fts) VALUES ('rebuild')")
+            conn.execute(trigger)
+        if users:
+            conn.executemany(
+                "INSERT INTO message (text, sender_id, receiver_id) VALUES (?, ?, ?)",
+                _messages(messages, users, rnd),
+            )
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    return {
+        "users": users,
+        "items": items,
+        "messages": messages if users else 0,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# settings are read on first import of the app, point them at scratch files
+TMP_DIR = tempfile.mkdtemp(prefix="store-tests-")
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{TMP_DIR}/primary.db"
+os.environ["SECRET_KEY"] = "tests-secret-key"
+os.environ["DB_ECHO"] = "false"
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    # one event loop for the session, pooled aiosqlite connections are bound to it
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def tables(anyio_backend):
+    import models.chat  # noqa: F401
+    import models.item  # noqa: F401
+    import models.user  # noqa: F401
+    from core.database import async_engine, create_tables
+
+    await create_tables()
+    yield
+    await async_engine.dispose()
@@ -0,0 +1,92 @@
+import asyncio
+
+import orjson
+import pytest
+
+from helpers.backplane import UnixSocketBackplane
+from helpers.socket_manager import ConnectionManager
+from schemas.chat import SendMessage
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent: list[dict] = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        self.sent.append(orjson.loads(text))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def eventually(check, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not check():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+async def managers(tmp_path):
+    path = str(tmp_path / "backplane.sock")
+    # two workers of one host, the first one also runs the broker
+    first = ConnectionManager(UnixSocketBackplane(path, retry_interval=0.05))
+    second = ConnectionManager(UnixSocketBackplane(path, retry_interval=0.05))
+    await first.start()
+    await second.start()
+    yield first, second
+    await second.stop()
+    await first.stop()
+
+
+async def test_fan_out_across_managers(managers):
+    first, second = managers
+    alice, bob = FakeWebSocket(), FakeWebSocket()
+    await first.connect(alice, "alice")
+    await second.connect(bob, "bob")
+    for manager in managers:
+        await eventually(lambda: set(manager.online_users()) == {"alice", "bob"})
+
+    await first.broadcast(SendMessage(receiver="all", text="hi", sender="alice"))
+    await eventually(lambda: bob.sent)
+    assert bob.sent == [{"receiver": "all", "text": "hi", "sender": "alice"}]
+
+    await second.send_personal_message(
+        SendMessage(receiver="alice", text="psst", sender="bob")
+    )
+    await eventually(lambda: alice.sent and len(bob.sent) == 2)
+    # the receiver on the other worker and the sender's echo
+    assert alice.sent == [{"receiver": "alice", "text": "psst", "sender": "bob"}]
+    assert bob.sent[-1] == alice.sent[0]
+
+
+async def test_user_goes_offline_on_other_manager(managers):
+    first, second = managers
+    await first.connect(FakeWebSocket(), "carol")
+    await eventually(lambda: "carol" in second.online_users())
+
+    await first.disconnect("carol")
+    await eventually(lambda: "carol" not in second.online_users())
+
+
+async def test_failed_send_disconnects(managers):
+    first, second = managers
+
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_text(self, text: str):
+            raise ConnectionResetError
+
+    await first.connect(BrokenWebSocket(), "alice")
+    await second.connect(FakeWebSocket(), "bob")
+    await eventually(lambda: set(second.online_users()) == {"alice", "bob"})
+
+    await second.broadcast(SendMessage(receiver="all", text="hi", sender="bob"))
+    await eventually(lambda: second.online_users() == ["bob"])
+    assert "alice" not in first.active_connections
+    assert not first._disconnects
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from fastapi import Request
+
+from helpers.conditional import entity_etag, is_not_modified, validators
+
+
+def _request(if_none_match: str) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())]
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_tags_are_weak():
+    # CompressionMiddleware keeps weak tags, so 200 and 304 carry the same one
+    headers = validators(entity_etag(1, datetime(2024, 1, 1)))
+    assert headers["ETag"].startswith('W/"1-')
+
+
+def test_if_none_match_compares_weakly():
+    etag = entity_etag(1, datetime(2024, 1, 1))
+    assert is_not_modified(_request(etag), etag)
+    assert is_not_modified(_request(etag.removeprefix("W/")), etag)
+    assert is_not_modified(_request(f'"other", {etag}'), etag)
+    assert not is_not_modified(_request('W/"other"'), etag)
+    # strong tags passed by the caller, e.g. of media, still match
+    assert is_not_modified(_request('W/"key"'), '"key"')
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from core.database import async_db_session, commit, rollback
+from dao.item import ItemsDAO
+from helpers.cache import EntityCache, MemoryCacheBackend, entity_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = MemoryCacheBackend()
+    monkeypatch.setattr(entity_cache, "backend", backend)
+    return backend
+
+
+async def test_set_is_skipped_after_invalidation():
+    cache = EntityCache(MemoryCacheBackend(), ttl=60, maxsize=10)
+    generation = cache.generation("item", 1)
+
+    # a write lands between the reader's query and its cache fill
+    await cache.invalidate("item", 1)
+    await cache.set("item", 1, {}, b"old", generation=generation)
+    assert await cache.get("item", 1, {}) is None
+
+    await cache.set("item", 1, {}, b"new", generation=cache.generation("item", 1))
+    assert await cache.get("item", 1, {}) == b"new"
+
+
+async def test_forgotten_generation_does_not_match_old_readers():
+    cache = EntityCache(MemoryCacheBackend(), ttl=60, maxsize=1)
+    await cache.invalidate("item", 1)
+    generation = cache.generation("item", 1)
+    await cache.invalidate("item", 1)
+    # pushes item:1 out of the bounded generation map
+    await cache.invalidate("item", 2)
+
+    await cache.set("item", 1, {}, b"old", generation=generation)
+    assert await cache.get("item", 1, {}) is None
+
+
+async def _create_item(name: str) -> int:
+    async with async_db_session() as session:
+        item = await ItemsDAO(session).add_one_and_return(name=name, price=1)
+        await commit(session)
+    return item.id
+
+
+async def test_update_invalidates_only_after_commit(tables, backend):
+    item_id = await _create_item("before")
+    async with async_db_session() as session:
+        assert (await ItemsDAO(session).find_one_response(item_id)).name == "before"
+    assert await entity_cache.get("item", item_id, {}) is not None
+
+    async with async_db_session() as session:
+        await ItemsDAO(session).update_one_by_id(item_id, name="after")
+        # other requests still see the committed row until the commit
+        assert await entity_cache.get("item", item_id, {}) is not None
+        await commit(session)
+    assert await entity_cache.get("item", item_id, {}) is None
+
+    async with async_db_session() as session:
+        assert (await ItemsDAO(session).find_one_response(item_id)).name == "after"
+
+
+async def test_rollback_keeps_cache(tables, backend):
+    item_id = await _create_item("kept")
+    async with async_db_session() as session:
+        await ItemsDAO(session).find_one_response(item_id)
+
+    async with async_db_session() as session:
+        dao = ItemsDAO(session)
+        await dao.update_one_by_id(item_id, name="discarded")
+        # the session reads its own uncommitted write, not the cache
+        assert (await dao.find_one_response(item_id)).name == "discarded"
+        await rollback(session)
+    cached = await entity_cache.get("item", item_id, {})
+    assert cached is not None and b"kept" in cached
+
+
+async def test_cached_entity_keeps_its_updated(tables, backend):
+    item_id = await _create_item("versioned")
+    async with async_db_session() as session:
+        entity, updated = await ItemsDAO(session).find_one_versioned(item_id)
+
+    # a write that bypasses the DAO is not seen until the entry expires
+    async with async_db_session() as session:
+        await session.execute(
+            text("UPDATE item SET name = 'bypass', updated = :now WHERE id = :id"),
+            {"now": datetime(2000, 1, 1), "id": item_id},
+        )
+        await commit(session)
+    async with async_db_session() as session:
+        cached = await ItemsDAO(session).find_one_versioned(item_id)
+    assert cached == (entity, updated)
+    assert cached[0].name == "versioned"
@@ -0,0 +1,94 @@
+import pytest
+
+from helpers.media import CachedFileResponse, FileDescriptorCache, _parse_range
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("bytes=0-9", (0, 10)),
+        ("bytes=5-", (5, 100)),
+        ("bytes=-5", (95, 100)),
+        ("bytes=-500", (0, 100)),
+        ("bytes=90-500", (90, 100)),
+        # ignored, the whole file is sent
+        ("bytes=0-1,4-5", None),
+        ("bytes=9-2", None),
+        ("bytes=a-b", None),
+        ("items=0-9", None),
+    ],
+)
+def test_parse_range(value, expected):
+    assert _parse_range(value, 100) == expected
+
+
+@pytest.mark.parametrize("value", ["bytes=100-", "bytes=-0"])
+def test_parse_range_not_satisfiable(value):
+    with pytest.raises(ValueError):
+        _parse_range(value, 100)
+
+
+async def _call(response, headers=None, method="GET") -> list[dict]:
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "headers": [
+            (k.lower().encode(), v.encode()) for k, v in (headers or {}).items()
+        ],
+    }
+    await response(scope, receive, send)
+    return messages
+
+
+async def test_range_is_read_from_cached_descriptor(tmp_path, monkeypatch):
+    cache = FileDescriptorCache(maxsize=4)
+    monkeypatch.setattr("helpers.media.media_files", cache)
+    path = tmp_path / "file.bin"
+    path.write_bytes(bytes(range(256)) * 1024)
+    opened = await cache.acquire(str(path))
+    response = CachedFileResponse(opened, str(path))
+    response.chunk_size = 1000
+
+    messages = await _call(response, {"Range": "bytes=10-2509"})
+    start, *bodies = messages
+    headers = dict(start["headers"])
+    assert start["status"] == 206
+    assert headers[b"content-range"] == b"bytes 10-2509/262144"
+    assert headers[b"content-length"] == b"2500"
+    assert b"".join(m["body"] for m in bodies) == path.read_bytes()[10:2510]
+    assert [m["more_body"] for m in bodies] == [True, True, False]
+    assert opened.users == 0
+
+    cache.forget(str(path))
+    assert opened.evicted
+
+
+async def test_head_and_unsatisfiable_range(tmp_path, monkeypatch):
+    cache = FileDescriptorCache(maxsize=4)
+    monkeypatch.setattr("helpers.media.media_files", cache)
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"hello")
+
+    opened = await cache.acquire(str(path))
+    start, body = await _call(CachedFileResponse(opened, str(path)), method="HEAD")
+    assert start["status"] == 200
+    assert dict(start["headers"])[b"content-length"] == b"5"
+    assert body["body"] == b""
+
+    opened = await cache.acquire(str(path))
+    response = CachedFileResponse(opened, str(path))
+    start, _ = await _call(response, {"Range": "bytes=5-"})
+    assert start["status"] == 416
+    assert dict(start["headers"])[b"content-range"] == b"bytes */5"
+    assert opened.users == 0
+    cache.close()
@@ -0,0 +1,45 @@
+import pytest
+
+from dao.chat import MessageDAO
+from helpers.message_writer import MessageWriter
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def inserts(monkeypatch):
+    """Batches passed to insert_many; the first `failures` calls raise."""
+    calls = {"failures": 0, "rows": []}
+
+    async def insert_many(self, rows):
+        if calls["failures"] > 0:
+            calls["failures"] -= 1
+            raise ConnectionError("database is gone")
+        calls["rows"].extend(rows)
+        return len(rows)
+
+    monkeypatch.setattr(MessageDAO, "insert_many", insert_many)
+    return calls
+
+
+async def test_failed_batch_is_retried(tables, inserts):
+    writer = MessageWriter(10, 1.0, 100, retries=3, retry_delay=0.001)
+    inserts["failures"] = 2
+    await writer.start()
+    await writer.add(text="hi", sender_id=1, receiver_id=None)
+    await writer.stop()
+
+    assert [row["text"] for row in inserts["rows"]] == ["hi"]
+    assert writer.stats() == {"buffered": 0, "written": 1, "failed": 2, "dropped": 0}
+
+
+async def test_batch_is_dropped_after_retries(tables, inserts):
+    writer = MessageWriter(10, 1.0, 100, retries=1, retry_delay=0.001)
+    inserts["failures"] = 2
+    await writer.start()
+    await writer.add(text="hi", sender_id=1, receiver_id=None)
+    await writer.add(text="there", sender_id=1, receiver_id=None)
+    await writer.stop()
+
+    assert inserts["rows"] == []
+    assert writer.stats() == {"buffered": 0, "written": 0, "failed": 2, "dropped": 2}
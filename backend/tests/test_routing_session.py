@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import func, insert, select
+
+from core import database
+from core.database import async_db_session, create_engine_and_session
+from models.base import MappedBase
+from models.item import Item
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def replica(tables, tmp_path, monkeypatch):
+    """A replica database holding one item the primary does not have."""
+    engine, session_maker = create_engine_and_session(
+        f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(MappedBase.metadata.create_all)
+    async with session_maker() as session:
+        await session.execute(insert(Item).values(name="replica only"))
+        await session.commit()
+    monkeypatch.setattr(database, "replica_engines", [engine])
+    yield engine
+    await engine.dispose()
+
+
+async def replica_rows(session) -> int:
+    query = select(func.count()).select_from(Item).filter_by(name="replica only")
+    return (await session.execute(query)).scalar_one()
+
+
+async def test_reads_go_to_replica(replica):
+    async with async_db_session() as session:
+        assert await replica_rows(session) == 1
+        assert "primary" not in session.sync_session.info
+
+
+async def test_session_sticks_to_primary_after_flush(replica):
+    async with async_db_session() as session:
+        assert await replica_rows(session) == 1
+        session.add(Item(name="written"))
+        await session.flush()
+        assert session.sync_session.info["primary"]
+        assert await replica_rows(session) == 0
+        await session.rollback()
+        # still on the primary after the transaction ends
+        assert await replica_rows(session) == 0
+
+
+async def test_session_sticks_to_primary_after_dml(replica):
+    async with async_db_session() as session:
+        await session.execute(insert(Item).values(name="written"))
+        assert await replica_rows(session) == 0
+        await session.rollback()
+
+
+async def test_primary_flag_pins_reads(replica):
+    async with async_db_session() as session:
+        session.sync_session.info["primary"] = True
+        assert await replica_rows(session) == 0
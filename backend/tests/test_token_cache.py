@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+import exceptions
+from helpers.security import TokenCache, create_user_tokens
+from schemas.user import TokenData
+
+
+def _token(user_id: int = 1) -> tuple[str, TokenData]:
+    user = TokenData(id=user_id, username=f"user{user_id}", is_active=True)
+    return create_user_tokens(user).access_token, user
+
+
+def test_revoked_token_is_rejected():
+    cache = TokenCache(maxsize=10)
+    token, user = _token()
+    cache.set(token, user, time.time() + 60)
+    assert cache.get(token) == user
+
+    cache.revoke(token)
+    with pytest.raises(type(exceptions.CREDENTIALS_EXCEPTION_REVOKED)):
+        cache.get(token)
+
+
+def test_expired_revocations_are_pruned():
+    cache = TokenCache(maxsize=10)
+    token, user = _token()
+    cache.revoke(token)
+    # as if the token had expired a while ago
+    key = cache.digest(token)
+    cache._revoked[key] = 0.0
+    cache._revoked_expiry = [(0.0, key)]
+
+    cache.revoke(_token(2)[0])
+    assert key not in cache._revoked
+    assert len(cache._revoked) == len(cache._revoked_expiry) == 1
+    assert cache.get(token) is None
+
+
+def test_concurrent_use_keeps_the_bound():
+    cache = TokenCache(maxsize=50)
+    tokens = [_token(i) for i in range(200)]
+    errors = []
+
+    def worker(offset: int):
+        try:
+            for i in range(2000):
+                token, user = tokens[(i + offset) % len(tokens)]
+                if cache.get(token) is None:
+                    cache.set(token, user, time.time() + 60)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(cache._entries) <= 50
@@ -0,0 +1,33 @@
+from helpers.cache import UserDirectory
+
+
+def test_rename_removes_old_name():
+    directory = UserDirectory(maxsize=10)
+    directory.set("alice", 1)
+    directory.set("alicia", 1)
+
+    assert directory.get_id("alice") is None
+    assert directory.get_id("alicia") == 1
+    assert directory.get_username(1) == "alicia"
+
+
+def test_name_taken_over_by_another_id():
+    directory = UserDirectory(maxsize=10)
+    directory.set("alice", 1)
+    directory.set("alice", 2)
+
+    assert directory.get_id("alice") == 2
+    assert directory.get_username(1) is None
+    assert directory.get_username(2) == "alice"
+
+
+def test_eviction_keeps_both_maps_in_step():
+    directory = UserDirectory(maxsize=2)
+    for _id, name in enumerate(["a", "b", "c"], start=1):
+        directory.set(name, _id)
+    directory.set("b", 2)
+
+    assert directory.get_id("a") is None
+    assert directory.get_username(1) is None
+    assert {directory.get_username(i) for i in (2, 3)} == {"b", "c"}
+    assert len(directory._ids) == len(directory._names) == 2